@@ -1,32 +1,37 @@
-import pickle
-import os
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-from itertools import chain
-from collections import Counter
-
-# Function to load the results from a pickle file
-def load_results(filename):
-    with open(filename, 'rb') as f:
-        return pickle.load(f)
+import sys
+import argparse
+from results_store import load_results
+from metrics import compute_metrics, load_metrics, save_comparison_data
+from plotting import WORDCLOUD_OPTIONS, show_or_save
 
 # Function to display the top words of each topic from the topic modelling
 def display_topics(top_words_per_topic):
     for topic_id, words in top_words_per_topic.items():
         print(f"Topic {topic_id}: {', '.join(words)}")
 
+# Function to visualize the word cloud of one topic, an existing WordCloud instance can be reused
+def visualize_wordcloud(words, topic_id, output_path=None, wordcloud=None):
+    # matplotlib and wordcloud are only imported once a figure is drawn, metrics-only runs never load them
+    import matplotlib.pyplot as plt
+    from wordcloud import WordCloud
+    if wordcloud is None:
+        wordcloud = WordCloud(**WORDCLOUD_OPTIONS)
+    wordcloud.generate(' '.join(words))
+    fig = plt.figure(figsize=(8, 6))
+    plt.imshow(wordcloud, interpolation='bilinear')
+    plt.axis('off')
+    plt.title(f"Word Cloud for Topic {topic_id}")
+    show_or_save(fig, output_path)
+
 # Function to visualize word clouds for each topic
 def visualize_wordclouds(top_words_per_topic):
     for topic_id, words in top_words_per_topic.items():
-        wordcloud = WordCloud(width=800, height=400, background_color='white').generate(' '.join(words))
-        plt.figure(figsize=(8, 6))
-        plt.imshow(wordcloud, interpolation='bilinear')
-        plt.axis('off')
-        plt.title(f"Word Cloud for Topic {topic_id}")
-        plt.show()
+        visualize_wordcloud(words, topic_id)
 
 # Function to visualize lemma frequency for a specific document
 def visualize_lemma_frequency(lemmas, doc_id):
+    import matplotlib.pyplot as plt
+
     # Convert the list of lemmas with their counts to a dictionary
     most_common_lemmas = dict(lemmas)
 
@@ -40,128 +45,81 @@ def visualize_lemma_frequency(lemmas, doc_id):
     plt.show()
 
 # Function to display a summary of lemmas, topic words, intersections, and the percentage of topic words overlapping with lemmas
-def display_summary(results):
-    most_frequent_lemmas = set()
-    all_topic_words = set()
-
-    # Collect lemmas and topic words from each document
-    for result in results['comparison_results']:
-        lemmas = [lemma for lemma, count in result['most_frequent_lemmas']]  # Extract the lemmas from the list of tuples
-        most_frequent_lemmas.update(lemmas)
-
-        # Collect topic words from all dominant topics
-        dominant_topic_words = set(chain.from_iterable([results['top_words_per_topic'][topic] for topic in result['dominant_topics']]))
-        all_topic_words.update(dominant_topic_words)
-
-    # Calculate intersections between lemmas and topic words
-    intersecting_words = most_frequent_lemmas.intersection(all_topic_words)
-    total_topic_words = len(all_topic_words)
-    intersection_size = len(intersecting_words)
-
-    # Calculate percentage of topic words overlapping with lemmas
-    topic_intersection_ratio = (intersection_size / total_topic_words * 100) if total_topic_words > 0 else 0
-
-    # Count the number of processed documents
-    num_docs = len(results['comparison_results'])
+def display_summary(results, metrics=None):
+    # All metrics are computed in one pass, pass them in to reuse them across the display and save functions
+    if metrics is None:
+        metrics = compute_metrics(results)
 
     # Display a summary with information
     print("\nSummary:")
-    print(f"Number of Processed Documents: {num_docs}")
-    print(f"Total Most Frequent Lemmas: {len(most_frequent_lemmas)}")
-    print(f"Total Topic Words: {total_topic_words}")
-    print(f"Intersecting Lemmas and Topic Words: {intersection_size}")
-    print(f"Percentage of Topic Words Overlapping with Lemmas: {topic_intersection_ratio:.2f}%")
+    print(f"Number of Processed Documents: {metrics['num_docs']}")
+    print(f"Total Most Frequent Lemmas: {metrics['num_most_frequent_lemmas']}")
+    print(f"Total Topic Words: {metrics['num_topic_words']}")
+    print(f"Intersecting Lemmas and Topic Words: {metrics['intersection_size']}")
+    print(f"Percentage of Topic Words Overlapping with Lemmas: {metrics['topic_intersection_ratio']:.2f}%")
 
 
 # Function to display Jaccard similarity results for each document and globally
-def display_jaccard_similarities(results, visualize_lemmas=False):
-    global_jaccard_sim = []
-    for result in results['comparison_results']:
-        lemmas = set([lemma for lemma, count in result['most_frequent_lemmas']])
-        common_words = set(result['common_words'])
-        jaccard_sim = len(common_words) / len(lemmas.union(common_words)) if len(lemmas.union(common_words)) > 0 else 0
-        global_jaccard_sim.append(jaccard_sim)
-
-        print(f"Document {result['document']}: Jaccard Similarity = {jaccard_sim:.3f}")
-
-        # Visualize Lemma Frequency if the option is enabled
-        if visualize_lemmas:
+def display_jaccard_similarities(results, visualize_lemmas=False, metrics=None):
+    if metrics is None:
+        metrics = compute_metrics(results)
+
+    for doc_id, jaccard_sim in zip(metrics['documents'], metrics['jaccard_similarities']):
+        print(f"Document {doc_id}: Jaccard Similarity = {jaccard_sim:.3f}")
+
+    # Visualize Lemma Frequency if the option is enabled
+    if visualize_lemmas:
+        for result in results['comparison_results']:
             visualize_lemma_frequency(result['most_frequent_lemmas'], result['document'])
     
     # Print global Jaccard similarity (average accross all documents)
-    avg_jaccard_similarity = sum(global_jaccard_sim) / len(global_jaccard_sim)
-    print(f"\nGlobal Jaccard Similarity (Average for all documents): {avg_jaccard_similarity:.3f}")
+    print(f"\nGlobal Jaccard Similarity (Average for all documents): {metrics['global_jaccard_similarity']:.3f}")
 
 # Function to save Jaccard similarity results and topic_intersection_ratio
-def save_jaccard_and_topic_intersection(results, input_filename):
-    jaccard_data = []
-    topic_intersection_ratio = 0  # Initialize ratio for calculation
-
-    # Calculate Jaccard similarities for each document
-    for result in results['comparison_results']:
-        lemmas = set([lemma for lemma, count in result['most_frequent_lemmas']])
-        common_words = set(result['common_words'])
-        jaccard_sim = len(common_words) / len(lemmas.union(common_words)) if len(lemmas.union(common_words)) > 0 else 0
-        jaccard_data.append(jaccard_sim)
-
-    # Calculate topic intersection ratio
-    most_frequent_lemmas = set()
-    all_topic_words = set()
-
-    for result in results['comparison_results']:
-        lemmas = [lemma for lemma, count in result['most_frequent_lemmas']]  # Extract the lemmas from the list of tuples
-        most_frequent_lemmas.update(lemmas)
-
-        # Collect topic words from all dominant topics
-        dominant_topic_words = set(chain.from_iterable([results['top_words_per_topic'][topic] for topic in result['dominant_topics']]))
-        all_topic_words.update(dominant_topic_words)
-
-    intersecting_words = most_frequent_lemmas.intersection(all_topic_words)
-    total_topic_words = len(all_topic_words)
-    intersection_size = len(intersecting_words)
-    
-    if total_topic_words > 0:
-        topic_intersection_ratio = (intersection_size / total_topic_words) * 100  # Calculate percentage
-
-    # Extract time span from input filename
-    time_span = os.path.basename(input_filename).replace('results_', '').replace('.pkl', '')
-
-    # Create 'Comparison Results' folder if it doesn't exist
-    comparison_folder = 'Comparison Results'
-    if not os.path.exists(comparison_folder):
-        os.makedirs(comparison_folder)
-
-    save_filename = os.path.join(comparison_folder, f'data_{time_span}.pkl')
-
-    # Save both Jaccard similarity and topic_intersection_ratio to file
-    save_data = {
-        'jaccard_similarities': jaccard_data,
-        'topic_intersection_ratio': topic_intersection_ratio
-    }
-
-    with open(save_filename, 'wb') as f:
-        pickle.dump(save_data, f)
-
+def save_jaccard_and_topic_intersection(results, input_filename, metrics=None):
+    if metrics is None:
+        metrics = load_metrics(input_filename, results)
+    return save_comparison_data(metrics, input_filename)
+
+
+# Command line entry point, e.g. python analyze_data.py Results/topic_model_results_2021-2025.pkl --metrics-only
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze the topic modelling results of one time span.")
+    parser.add_argument('filename', help="Results pickle file or results store directory")
+    parser.add_argument('--metrics-only', action='store_true',
+                        help="Only print the summary and Jaccard similarities and save the comparison data, no figures")
+    parser.add_argument('--no-wordclouds', action='store_true', help="Skip the word cloud of every topic")
+    parser.add_argument('--visualize-lemmas', action='store_true', help="Plot the lemma frequencies of every document")
+    parser.add_argument('--comparison-folder', default='Comparison Results')
+    args = parser.parse_args(argv)
+
+    # Compute all metrics once (cached next to the input file) and share them between the functions below;
+    # with a valid cache the results themselves are only loaded when topics or figures are needed
+    results = None
+    if not args.metrics_only:
+        results = load_results(args.filename)
+    metrics = load_metrics(args.filename, results)
+
+    if not args.metrics_only:
+        # Display the top words for each topic
+        print("Top Words Per Topic:")
+        display_topics(results['top_words_per_topic'])
+
+        # Visualize word clouds for each topic
+        if not args.no_wordclouds:
+            visualize_wordclouds(results['top_words_per_topic'])
+
+    # Display the summary of lemmas, topic words, intersections, and overlap percentage
+    display_summary(results, metrics)
+
+    # Display Jaccard similarity results for each document and global average
+    print("\nJaccard Similarity Results:")
+    display_jaccard_similarities(results, visualize_lemmas=args.visualize_lemmas and not args.metrics_only, metrics=metrics)
+
+    # Save the Jaccard similarity results and topic_intersection_ratio
+    save_comparison_data(metrics, args.filename, args.comparison_folder)
+    return 0
 
 ## Main execution point
-
-# Load the results from a pickle file
-filename = '/your/path/file.pkl'  # Change to actual file path
-results = load_results(filename)
-
-# Display the top words for each topic
-print("Top Words Per Topic:")
-display_topics(results['top_words_per_topic'])
-
-# Visualize word clouds for each topic
-visualize_wordclouds(results['top_words_per_topic'])
-
-# Display the summary of lemmas, topic words, intersections, and overlap percentage
-display_summary(results)
-
-# Display Jaccard similarity results for each document and global average
-print("\nJaccard Similarity Results:")
-display_jaccard_similarities(results, visualize_lemmas=False)  # Set to True to enable lemma frequency visualization
-
-# Save the Jaccard similarity results and topic_intersection_ratio
-save_jaccard_and_topic_intersection(results, filename)
+if __name__ == '__main__':
+    sys.exit(main())
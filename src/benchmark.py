@@ -0,0 +1,366 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import subprocess
+import argparse
+import platform
+import tempfile
+import types
+import tracemalloc
+from contextlib import redirect_stdout
+import nltk
+import preprocessing
+from gensim import corpora, models
+from xmi_reader import find_xmi_files, read_sofa_text
+from synthetic_xmi import generate_corpus
+from instrumentation import StageProfiler, set_profiler
+from lda_training import train_lda_model
+from lda_topic_modelling import process_documents
+from topic_comparison import document_topic_matrix, dominant_topics_from_matrix, compare_lemmas_with_topics
+from metrics import compute_metrics
+
+BENCHMARKS = ('ingest', 'preprocessing', 'lda', 'analysis', 'end_to_end')
+
+# Relative change of a throughput (drop) or peak memory (growth) that counts as a regression
+REGRESSION_THRESHOLD = 0.15
+
+# Modules whose import time is measured by the startup benchmark, with the heavy dependencies they used to import eagerly
+STARTUP_MODULES = {
+    'analyze_data': ('matplotlib.pyplot', 'wordcloud'),
+    'compare_results': ('matplotlib.pyplot', 'matplotlib.widgets', 'scipy.stats', 'pandas'),
+    'lda_topic_modelling': ('gensim', 'nltk'),
+    'metrics': ()
+}
+HEAVY_MODULES = ('gensim', 'nltk', 'matplotlib', 'scipy', 'pandas', 'wordcloud', 'pyarrow')
+
+# NLTK resources the preprocessing pipeline needs
+NLTK_RESOURCES = ('corpora/stopwords', 'tokenizers/punkt', 'taggers/averaged_perceptron_tagger',
+                  'taggers/universal_tagset', 'corpora/wordnet')
+
+# Small German stopword list used when the NLTK corpus is not installed
+OFFLINE_STOPWORDS = ('aber', 'als', 'am', 'an', 'auch', 'auf', 'aus', 'bei', 'bin', 'bis', 'da', 'dass', 'dem', 'den',
+                     'der', 'des', 'die', 'dies', 'diese', 'dieser', 'doch', 'du', 'durch', 'ein', 'eine', 'einem',
+                     'einen', 'einer', 'er', 'es', 'für', 'hat', 'ich', 'ihm', 'ihr', 'im', 'in', 'ist', 'kann',
+                     'man', 'mir', 'mit', 'nach', 'nicht', 'noch', 'nur', 'oder', 'sein', 'sich', 'sie', 'sind', 'so',
+                     'um', 'und', 'uns', 'vom', 'von', 'vor', 'war', 'was', 'welche', 'wenn', 'werden', 'wie', 'wir',
+                     'wird', 'zu', 'zum', 'zur', 'über')
+
+# Suffix rules of the offline POS tagger, checked in order
+OFFLINE_TAG_RULES = (
+    (re.compile(r'(ung|heit|keit|schaft|tion|nis)$'), 'NOUN'),
+    (re.compile(r'(lich|ig|isch|bar|sam)$'), 'ADJ'),
+    (re.compile(r'(ieren|eln|ern|en)$'), 'VERB')
+)
+
+# Function to check whether all NLTK data needed for preprocessing is installed
+def nltk_data_available():
+    for resource in NLTK_RESOURCES:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            return False
+    return True
+
+# Offline stand-ins for the NLTK data, deterministic and with a similar cost profile (one pass per token)
+class OfflineStopwords:
+    def words(self, language):
+        return list(OFFLINE_STOPWORDS)
+
+class OfflineLemmatizer:
+    def lemmatize(self, word, pos='n'):
+        return word[:-1] if len(word) > 4 and word.endswith(('s', 'e')) else word
+
+def offline_tag(tokens):
+    tagged = []
+    for token in tokens:
+        tag = 'NOUN'
+        if token in OFFLINE_STOPWORDS:
+            tag = 'DET'
+        else:
+            for pattern, rule_tag in OFFLINE_TAG_RULES:
+                if pattern.search(token):
+                    tag = rule_tag
+                    break
+        tagged.append((token, tag))
+    return tagged
+
+def offline_pos_tag_sents(sentences, tagset=None, lang='eng'):
+    return [offline_tag(tokens) for tokens in sentences]
+
+def offline_pos_tag(tokens, tagset=None, lang='eng'):
+    return offline_tag(tokens)
+
+def offline_word_tokenize(text, language='english', preserve_line=False):
+    return text.split()
+
+# Function to get the attributes of the preprocessing module the offline stand-ins replace
+# preprocessing's own `nltk` reference is swapped for a stand-in, the real nltk module stays untouched
+def offline_nltk_patches():
+    return {
+        'nltk': types.SimpleNamespace(pos_tag_sents=offline_pos_tag_sents, pos_tag=offline_pos_tag),
+        'stopwords': OfflineStopwords(),
+        'word_tokenize': offline_word_tokenize,
+        'WordNetLemmatizer': OfflineLemmatizer,
+        '_preprocessor': None    # Rebuild the pipeline with the stand-ins on next use
+    }
+
+# Function to switch the preprocessing pipeline of this process (and forked workers) to the offline NLTK stand-ins
+def install_offline_nltk():
+    for name, value in offline_nltk_patches().items():
+        setattr(preprocessing, name, value)
+
+# Function to run a benchmark function, keeping the fastest of several repeats and the peak traced memory
+def measure(function, repeats=3):
+    best_seconds = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+
+    # Memory is measured in a separate run so tracing does not slow down the timed runs
+    tracemalloc.start()
+    result = function()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best_seconds, peak_bytes / 2 ** 20, result
+
+# Function to build the benchmark result entry of one stage
+def stage_result(seconds, peak_mb, num_docs, num_tokens, extra=None):
+    result = {
+        'seconds': seconds,
+        'docs_per_second': num_docs / seconds if seconds > 0 else 0.0,
+        'tokens_per_second': num_tokens / seconds if seconds > 0 else 0.0,
+        'peak_memory_mb': peak_mb
+    }
+    result.update(extra or {})
+    return result
+
+# Function to run the selected benchmarks on a synthetic corpus
+def run_benchmarks(data_dir, benchmarks=BENCHMARKS, repeats=3, passes=5, num_topics=15, workers=1):
+    file_paths = sorted(find_xmi_files(data_dir))
+    raw_texts = [read_sofa_text(path) for path in file_paths]
+    num_docs = len(file_paths)
+    num_raw_tokens = sum(len(text.split()) for text in raw_texts)
+    preprocessor = preprocessing.get_preprocessor()
+    prep_docs = preprocessor.prepare_batch(raw_texts)
+    num_prep_tokens = sum(len(doc) for doc in prep_docs)
+    results = {}
+
+    if 'ingest' in benchmarks:
+        seconds, peak_mb, _ = measure(lambda: [read_sofa_text(path) for path in file_paths], repeats)
+        megabytes = sum(os.path.getsize(path) for path in file_paths) / 2 ** 20
+        results['ingest'] = stage_result(seconds, peak_mb, num_docs, num_raw_tokens,
+                                         {'megabytes_per_second': megabytes / seconds})
+
+    if 'preprocessing' in benchmarks:
+        # A fresh pipeline per run, otherwise the lemma cache of the previous run makes later runs look faster
+        def preprocess():
+            preprocessing._preprocessor = None
+            return preprocessing.get_preprocessor().prepare_batch(raw_texts)
+        seconds, peak_mb, _ = measure(preprocess, repeats)
+
+        # Split of the preprocessing time over its steps, from one instrumented run
+        profiler = StageProfiler()
+        previous_profiler = set_profiler(profiler)
+        try:
+            preprocess()
+        finally:
+            set_profiler(previous_profiler)
+        stage_seconds = {name: stats['seconds'] for name, stats in profiler.report()['stages'].items()}
+        results['preprocessing'] = stage_result(seconds, peak_mb, num_docs, num_raw_tokens, {'stages': stage_seconds})
+
+    if 'lda' in benchmarks or 'analysis' in benchmarks:
+        dictionary = corpora.Dictionary(prep_docs)
+        dictionary.filter_extremes(no_below=1, no_above=0.5)
+        corpus = [dictionary.doc2bow(doc) for doc in prep_docs]
+        corpus_tfidf = list(models.TfidfModel(corpus)[corpus])
+
+    if 'lda' in benchmarks:
+        seconds, peak_mb, (lda_model, training_stats) = measure(
+            lambda: train_lda_model(corpus_tfidf, dictionary, num_topics=num_topics, passes=passes, random_state=0), repeats)
+        results['lda'] = stage_result(seconds, peak_mb, num_docs, num_prep_tokens,
+                                      {'passes': passes, 'perplexity': training_stats['perplexity']})
+
+    if 'analysis' in benchmarks:
+        if 'lda' not in benchmarks:
+            lda_model, training_stats = train_lda_model(corpus_tfidf, dictionary, num_topics=num_topics, passes=passes,
+                                                        random_state=0)
+        top_words_per_topic = {topic_id: [word for word, prob in lda_model.show_topic(topic_id, topn=25)]
+                               for topic_id in range(lda_model.num_topics)}
+
+        # Dominant topics, lemma comparison and the analysis metrics of analyze_data.py
+        def analyze():
+            dominant_topics_per_doc = dominant_topics_from_matrix(document_topic_matrix(lda_model, corpus), 0.2)
+            comparison_results = compare_lemmas_with_topics(prep_docs, top_words_per_topic, dominant_topics_per_doc)
+            return compute_metrics({'comparison_results': comparison_results, 'top_words_per_topic': top_words_per_topic})
+        seconds, peak_mb, _ = measure(analyze, repeats)
+        results['analysis'] = stage_result(seconds, peak_mb, num_docs, num_prep_tokens)
+
+    if 'end_to_end' in benchmarks:
+        def end_to_end():
+            preprocessing._preprocessor = None
+            with redirect_stdout(io.StringIO()):    # The per-file progress lines would drown the report
+                return process_documents(data_dir, workers=workers,
+                                         lda_options={'num_topics': num_topics, 'passes': passes, 'random_state': 0})
+        seconds, peak_mb, _ = measure(end_to_end, repeats)
+        results['end_to_end'] = stage_result(seconds, peak_mb, num_docs, num_raw_tokens)
+    return results
+
+# Function to time a Python statement in a fresh interpreter, keeping the fastest of several runs
+def time_fresh_interpreter(statement, repeats=5):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                                   os.environ.get('PYTHONPATH')])))
+    best_seconds, output = None, ''
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', statement], env=env, check=True, capture_output=True,
+                                text=True).stdout
+        seconds = time.perf_counter() - start
+        best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+    return best_seconds, output.strip()
+
+# Function to measure the import time of the entry point modules, with and without their former eager imports
+def startup_times(repeats=5):
+    interpreter_seconds, _ = time_fresh_interpreter('pass', repeats)
+    times = {}
+    for module, eager_imports in STARTUP_MODULES.items():
+        statement = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        seconds, loaded = time_fresh_interpreter(statement, repeats)
+        eager_seconds, _ = time_fresh_interpreter(f"import {', '.join(eager_imports + (module,))}", repeats)
+        times[module] = {
+            'import_seconds': seconds - interpreter_seconds,
+            'eager_import_seconds': eager_seconds - interpreter_seconds,
+            'heavy_modules_loaded': loaded.split(',') if loaded else []
+        }
+    return times
+
+# Function to print the startup benchmark
+def print_startup_times(times):
+    print(f"{'module':<22} {'import s':>9} {'eager s':>9} {'saved s':>9}  heavy modules loaded")
+    for module, result in times.items():
+        print(f"{module:<22} {result['import_seconds']:>9.3f} {result['eager_import_seconds']:>9.3f} "
+              f"{result['eager_import_seconds'] - result['import_seconds']:>9.3f}  "
+              f"{', '.join(result['heavy_modules_loaded']) or '-'}")
+
+# Function to describe the setup of a benchmark run, results are only compared between equal setups
+def benchmark_setup(args, offline_nltk):
+    return {
+        'num_docs': args.num_docs,
+        'tokens_per_doc': args.tokens_per_doc,
+        'annotation_factor': args.annotation_factor,
+        'seed': args.seed,
+        'passes': args.passes,
+        'num_topics': args.num_topics,
+        'workers': args.workers,
+        'offline_nltk': offline_nltk,
+        'python': platform.python_version()
+    }
+
+# Function to compare results with a baseline, returning the regressions beyond the threshold
+def find_regressions(results, baseline_results, threshold=REGRESSION_THRESHOLD):
+    regressions = []
+    for name, result in results.items():
+        baseline = baseline_results.get(name)
+        if baseline is None:
+            continue
+        for metric in ('docs_per_second', 'tokens_per_second'):
+            if baseline[metric] > 0 and result[metric] < baseline[metric] * (1 - threshold):
+                regressions.append((name, metric, baseline[metric], result[metric]))
+        if baseline['peak_memory_mb'] > 0 and result['peak_memory_mb'] > baseline['peak_memory_mb'] * (1 + threshold):
+            regressions.append((name, 'peak_memory_mb', baseline['peak_memory_mb'], result['peak_memory_mb']))
+    return regressions
+
+# Function to print the benchmark results next to the baseline
+def print_results(results, baseline_results=None):
+    baseline_results = baseline_results or {}
+    print(f"{'benchmark':<14} {'docs/s':>10} {'tokens/s':>12} {'peak MB':>9} {'vs baseline':>12}")
+    for name, result in results.items():
+        change = ''
+        if name in baseline_results and baseline_results[name]['tokens_per_second'] > 0:
+            change = f"{result['tokens_per_second'] / baseline_results[name]['tokens_per_second'] - 1:+.1%}"
+        print(f"{name:<14} {result['docs_per_second']:>10.1f} {result['tokens_per_second']:>12.0f} "
+              f"{result['peak_memory_mb']:>9.1f} {change:>12}")
+
+# Main execution point, e.g. python benchmark.py --num-docs 200 --baseline benchmark_baseline.json
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark ingest, preprocessing, LDA and analysis on synthetic XMI files.",
+        epilog="Each stage reports docs/s, tokens/s and peak traced memory, the best of --repeats runs. A run with the "
+               "same setup as the baseline exits with status 1 when throughput drops or peak memory grows by more "
+               "than --threshold. Without the NLTK data, built-in stand-ins are used and the baseline records it.")
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument('--num-docs', type=int, default=100)
+    parser.add_argument('--tokens-per-doc', type=int, default=2000)
+    parser.add_argument('--annotation-factor', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--passes', type=int, default=5)
+    parser.add_argument('--num-topics', type=int, default=15)
+    parser.add_argument('--workers', type=int, default=1, help="Preprocessing workers of the end-to-end benchmark")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--data-dir', default=None, help="Keep the generated corpus here instead of a temporary folder")
+    parser.add_argument('--offline-nltk', action='store_true',
+                        help="Use the built-in NLTK stand-ins even if the NLTK data is installed")
+    parser.add_argument('--baseline', default='benchmark_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the new baseline")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="Allowed relative regression against the baseline (default: 0.15)")
+    parser.add_argument('--output', default=None, help="Write the results of this run to a JSON file")
+    parser.add_argument('--startup', action='store_true',
+                        help="Only measure the import time of the entry point modules in fresh interpreters")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        print_startup_times(startup_times(args.repeats))
+        return 0
+
+    # Without network access the NLTK data may be missing, the stand-ins keep the benchmark runnable offline
+    offline_nltk = args.offline_nltk or not nltk_data_available()
+    if offline_nltk:
+        print("Using offline NLTK stand-ins, results are only comparable to baselines that used them too")
+        install_offline_nltk()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='xmi_benchmark_')
+    try:
+        if not find_xmi_files(data_dir):
+            generate_corpus(data_dir, args.num_docs, args.tokens_per_doc, annotation_factor=args.annotation_factor,
+                            seed=args.seed)
+        results = run_benchmarks(data_dir, args.benchmarks, args.repeats, args.passes, args.num_topics, args.workers)
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(data_dir)
+
+    run = {'setup': benchmark_setup(args, offline_nltk), 'results': results}
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['setup'] != run['setup']:
+            print(f"Baseline {args.baseline} was recorded with a different setup, not comparing")
+            baseline = None
+    print_results(results, baseline['results'] if baseline else None)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline['results'], args.threshold)
+        for name, metric, baseline_value, value in regressions:
+            print(f"Regression in {name}: {metric} {baseline_value:.1f} -> {value:.1f}")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,9 @@
-import os
+import sys
 import pickle
-import matplotlib.pyplot as plt
-from matplotlib.widgets import CheckButtons
+import argparse
 import numpy as np
-from scipy.stats import norm
-import pandas as pd
+from comparison_index import period_label, sync_index, load_index
+from plotting import show_or_save
 
 # Load Jaccard similarity data and topic_intersection_ratio from files
 def load_data(filenames):
@@ -19,8 +18,10 @@ def load_data(filenames):
 
 
 # Function to display histograms back to back
-def plot_histograms(jaccard_data_list, labels):
-    plt.figure(figsize=(10, 6))
+def plot_histograms(jaccard_data_list, labels, output_path=None):
+    # matplotlib is only imported once a figure is drawn, so the module itself imports quickly
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=(10, 6))
     for data, label in zip(jaccard_data_list, labels):
         plt.hist(data, alpha=0.7, label=label, bins=15, edgecolor='black')  # Adjusted for better visibility
     
@@ -28,7 +29,7 @@ def plot_histograms(jaccard_data_list, labels):
     plt.xlabel("Jaccard Similarity")
     plt.ylabel("Frequency")
     plt.legend()
-    plt.show()
+    show_or_save(fig, output_path)
 
 # Function to calculate and display mean and standard deviation
 def calculate_statistics(jaccard_data_list, labels):
@@ -44,12 +45,18 @@ def calculate_statistics(jaccard_data_list, labels):
 
 # Function to toggle visibility of a line in the plot
 def toggle_visibility(label, lines, labels):
+    import matplotlib.pyplot as plt
     index = labels.index(label)
     lines[index].set_visible(not lines[index].get_visible())  # Toggle the visibility of the corresponding line
     plt.draw()  # Redraw the plot to reflect the changes
 
 # Interactive normal distribution plot with legend on the right and checkboxes on the left
-def plot_normal_distribution_interactive(jaccard_data_list, labels):
+# (when saving to a file the checkboxes are left out)
+def plot_normal_distribution_interactive(jaccard_data_list, labels, output_path=None):
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import CheckButtons
+    from scipy.stats import norm
+
     # Create the main plot
     fig, ax = plt.subplots(figsize=(10, 6))
     plt.subplots_adjust(left=0.3, right=0.8)  # Adjust the space to fit both checkboxes on the left and legend on the right
@@ -82,6 +89,10 @@ def plot_normal_distribution_interactive(jaccard_data_list, labels):
     # Place the legend outside the plot on the right
     ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
 
+    if output_path is not None:
+        show_or_save(fig, output_path)
+        return
+
     # Adjust the checkboxes to match only the valid labels
     check_ax = plt.axes([0.01, 0.4, 0.2, 0.5])  # Position for the checkboxes on the left of the plot
     check = CheckButtons(check_ax, valid_labels, [True] * len(valid_labels))  # Create checkboxes for valid lines
@@ -92,35 +103,40 @@ def plot_normal_distribution_interactive(jaccard_data_list, labels):
     plt.show()
 
 
-# Function to extract only the time span from a filename (e.g., '2021-2025')
-def extract_time_span(filename):
-    # Remove 'jaccard_data_' and '.pkl' to extract just the time span
-    return os.path.basename(filename).replace('data_', '').replace('topic_model_', '').replace('.pkl', '')
+# Function to print precomputed means and standard deviations
+def print_statistics(means, std_devs, labels):
+    for mean, std_dev, label in zip(means, std_devs, labels):
+        print(f"{label}: Mean = {mean:.3f}, Standard Deviation = {std_dev:.3f}")
 
 # Function to load and compare specific files or all files in the "Comparison Results" folder
 def compare_results(files=None, comparison_folder='Comparison Results'):
-    # If no specific files are provided, use all files in the folder
     if files is None:
-        files = [os.path.join(comparison_folder, f) for f in os.listdir(comparison_folder) if f.endswith('.pkl')]
-    
-    if len(files) == 0:
+        # Read all periods from the consolidated index (only new or changed files are unpickled), ordered by year
+        sync_index(comparison_folder)
+        index = load_index(comparison_folder)
+        labels = index['labels']
+        jaccard_data_list, intersection_ratios = index['jaccard_similarities'], index['topic_intersection_ratios']
+        means, std_devs = index['means'], index['std_devs']
+        print_statistics(means, std_devs, labels)
+    else:
+        # Extract labels (time spans) from file names
+        labels = [period_label(file) for file in files]
+
+        # Load Jaccard similarity data and intersection ratios
+        jaccard_data_list, intersection_ratios = load_data(files)
+        means, std_devs = calculate_statistics(jaccard_data_list, labels)
+
+    if len(labels) == 0:
         print("No Jaccard data files found.")
         return
-
-    # Extract labels (time spans) from file names
-    labels = [extract_time_span(file) for file in files]
-    
-    # Load Jaccard similarity data and intersection ratios
-    jaccard_data_list, intersection_ratios = load_data(files)
     
     # Plot histograms if there are 2 or fewer files
-    if len(files) <= 2:
+    if len(labels) <= 2:
         plot_histograms(jaccard_data_list, labels)
     else:
         print("More than two files, skipping histogram.")
     
-    # Calculate statistics and plot mean/std deviation graph
-    means, std_devs = calculate_statistics(jaccard_data_list, labels)
+    # Plot mean/std deviation graph
     plot_mean_std_graph(means, std_devs, labels)
 
     # Plot normal distributions with interactive toggle for visibility
@@ -130,7 +146,8 @@ def compare_results(files=None, comparison_folder='Comparison Results'):
     display_intersection_ratios_table(intersection_ratios, labels)
 
 # Function to display the intersection ratios in a table
-def display_intersection_ratios_table(ratios, labels):
+def display_intersection_ratios_table(ratios, labels, output_path=None):
+    import matplotlib.pyplot as plt
     fig, ax = plt.subplots(figsize=(6, 4))  # Set the size of the table
 
     # Hide axes
@@ -153,10 +170,11 @@ def display_intersection_ratios_table(ratios, labels):
     # Add the title above the table
     plt.suptitle("Topic Intersection Ratios", fontsize=14, y=1.15)
 
-    plt.show()
+    show_or_save(fig, output_path)
 
 # Function to plot the mean and standard deviation graph
-def plot_mean_std_graph(means, std_devs, labels):
+def plot_mean_std_graph(means, std_devs, labels, output_path=None):
+    import matplotlib.pyplot as plt
     x = np.arange(len(labels))
     
     fig, ax = plt.subplots(figsize=(12, 6))
@@ -169,15 +187,18 @@ def plot_mean_std_graph(means, std_devs, labels):
     ax.set_xticklabels(labels, rotation=45)
     
     plt.grid(True, linestyle='--', alpha=0.7)
-    plt.show()
+    show_or_save(fig, output_path)
+
+# Command line entry point, e.g. python compare_results.py (all periods) or python compare_results.py a.pkl b.pkl
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare Jaccard similarities and topic intersection ratios across time spans.")
+    parser.add_argument('files', nargs='*', help="Specific comparison files (default: all periods of the comparison folder)")
+    parser.add_argument('--comparison-folder', default='Comparison Results',
+                        help="Folder where all the Jaccard data files are stored")
+    args = parser.parse_args(argv)
+    compare_results(files=args.files or None, comparison_folder=args.comparison_folder)
+    return 0
 
 ## Main execution point
-
-comparison_folder = 'Comparison Results'  # Folder where all the Jaccard data files are stored
-
-# For comparing all results in the 'Comparison Results' folder
-compare_results()
-
-# For comparing all specific files
-specific_files = ['path/file_1.pkl', 'path/file_2.pkl']    # Update with actual file path
-#compare_results(files=specific_files)
+if __name__ == '__main__':
+    sys.exit(main())
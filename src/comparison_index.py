@@ -0,0 +1,116 @@
+import os
+import re
+import pickle
+import sqlite3
+import numpy as np
+
+INDEX_FILENAME = 'index.sqlite'
+YEAR_SPAN_PATTERN = re.compile(r'(\d{4})-(\d{4})')
+
+# Prefixes of results and comparison file names in front of the period label
+LABEL_PREFIXES = ('data_', 'topic_model_', 'results_')
+
+# Function to extract the period label from a results file, results store directory or comparison file name
+# (e.g. 'topic_model_results_2021-2025.pkl' or 'data_topic_model_2021-2025.pkl' -> '2021-2025')
+def period_label(filename):
+    label = os.path.basename(filename.rstrip(os.sep))
+    if label.endswith('.pkl'):
+        label = label[:-len('.pkl')]
+    for prefix in LABEL_PREFIXES:
+        if label.startswith(prefix):
+            label = label[len(prefix):]
+    return label
+
+# Function to get the first and last year of a period label, None for labels without years
+def period_years(label):
+    match = YEAR_SPAN_PATTERN.search(label)
+    if match is None:
+        return None, None
+    return int(match.group(1)), int(match.group(2))
+
+# Function to open the index of a comparison folder, creating the table on first use
+def connect_index(comparison_folder='Comparison Results'):
+    os.makedirs(comparison_folder, exist_ok=True)
+    connection = sqlite3.connect(os.path.join(comparison_folder, INDEX_FILENAME))
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS periods (
+            label TEXT PRIMARY KEY,
+            start_year INTEGER,
+            end_year INTEGER,
+            num_docs INTEGER,
+            jaccard_mean REAL,
+            jaccard_std REAL,
+            jaccard_similarities BLOB,
+            topic_intersection_ratio REAL,
+            source_file TEXT,
+            source_size INTEGER,
+            source_mtime_ns INTEGER
+        )""")
+    return connection
+
+# Function to insert or replace the summary of one period
+def update_period(connection, source_file, jaccard_similarities, topic_intersection_ratio):
+    label = period_label(source_file)
+    start_year, end_year = period_years(label)
+    jaccard_array = np.asarray(jaccard_similarities, dtype=np.float64)
+    stat = os.stat(source_file)
+    connection.execute(
+        "INSERT OR REPLACE INTO periods VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (label, start_year, end_year, len(jaccard_array),
+         float(np.mean(jaccard_array)) if len(jaccard_array) else 0.0,
+         float(np.std(jaccard_array)) if len(jaccard_array) else 0.0,
+         jaccard_array.tobytes(), float(topic_intersection_ratio),
+         os.path.basename(source_file), stat.st_size, stat.st_mtime_ns))
+    connection.commit()
+
+# Function to record a newly written comparison file in the index of its folder
+def index_comparison_file(source_file, jaccard_similarities, topic_intersection_ratio):
+    connection = connect_index(os.path.dirname(source_file) or '.')
+    try:
+        update_period(connection, source_file, jaccard_similarities, topic_intersection_ratio)
+    finally:
+        connection.close()
+
+# Function to bring the index up to date with the comparison files, only unpickling new or changed files
+def sync_index(comparison_folder='Comparison Results'):
+    connection = connect_index(comparison_folder)
+    try:
+        indexed = {source_file: (size, mtime_ns) for source_file, size, mtime_ns in
+                   connection.execute("SELECT source_file, source_size, source_mtime_ns FROM periods")}
+        present = set()
+        for filename in os.listdir(comparison_folder):
+            if not filename.endswith('.pkl'):
+                continue
+            present.add(filename)
+            path = os.path.join(comparison_folder, filename)
+            stat = os.stat(path)
+            if indexed.get(filename) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+            update_period(connection, path, data['jaccard_similarities'], data.get('topic_intersection_ratio', 0))
+
+        # Drop periods whose comparison file was removed
+        for source_file in set(indexed) - present:
+            connection.execute("DELETE FROM periods WHERE source_file = ?", (source_file,))
+        connection.commit()
+    finally:
+        connection.close()
+
+# Function to read all periods from the index in chronological order
+def load_index(comparison_folder='Comparison Results'):
+    connection = connect_index(comparison_folder)
+    try:
+        rows = connection.execute("""
+            SELECT label, jaccard_similarities, jaccard_mean, jaccard_std, topic_intersection_ratio
+            FROM periods ORDER BY start_year IS NULL, start_year, end_year, label""").fetchall()
+    finally:
+        connection.close()
+
+    return {
+        'labels': [row[0] for row in rows],
+        'jaccard_similarities': [np.frombuffer(row[1], dtype=np.float64) for row in rows],
+        'means': [row[2] for row in rows],
+        'std_devs': [row[3] for row in rows],
+        'topic_intersection_ratios': [row[4] for row in rows]
+    }
@@ -0,0 +1,185 @@
+import os
+import sys
+import time
+import pickle
+import argparse
+import numpy as np
+from gensim import models
+from xmi_reader import find_xmi_files
+from preprocessing import TAGGING_MODES, preprocess_files
+from results_store import MODEL_FILE, ResultsStore, save_results_store
+from topic_comparison import document_topic_matrix, dominant_topics_from_matrix, compare_lemmas_with_topics, find_common_lemmas
+from lda_topic_modelling import save_results
+
+# Same limits as the dictionary.filter_extremes call of a full run
+NO_ABOVE = 0.5
+KEEP_N = 100000
+
+# Function to find the .xmi files of a folder that are not part of the results yet
+def find_new_files(folder_path, source_files):
+    known = set(source_files)
+    return sorted(file_path for file_path in find_xmi_files(folder_path)
+                  if os.path.relpath(file_path, folder_path) not in known)
+
+# Function to extend the dictionary with the tokens of new documents
+# Policy: tokens already in the dictionary keep their ids, tokens seen before but filtered out by the
+# full run stay excluded, and tokens never seen before are admitted unless they occur in more than half
+# of all old and new documents (the no_above limit of a full run) or the dictionary is full
+def extend_dictionary(dictionary, new_docs, lemma_counts):
+    doc_frequencies = {}
+    for doc in new_docs:
+        for token in set(doc):
+            doc_frequencies[token] = doc_frequencies.get(token, 0) + 1
+
+    # dictionary.num_docs still counts every document of the full run, filter_extremes leaves it unchanged
+    max_docs = NO_ABOVE * (dictionary.num_docs + len(new_docs))
+    admitted = sorted(token for token, frequency in doc_frequencies.items()
+                      if token not in dictionary.token2id and token not in lemma_counts and frequency <= max_docs)
+    admitted = set(admitted[:max(0, KEEP_N - len(dictionary))])
+
+    # Only known and admitted tokens reach the dictionary, so excluded tokens never get an id
+    allowed = lambda token: token in dictionary.token2id or token in admitted
+    dictionary.add_documents([[token for token in doc if allowed(token)] for doc in new_docs])
+    return admitted
+
+# Function to grow the topic-word parameters of a trained model to a larger vocabulary
+def extend_lda_vocabulary(lda_model, dictionary):
+    num_new_terms = len(dictionary) - lda_model.num_terms
+    if num_new_terms > 0:
+        state = lda_model.state
+        # New terms start without sufficient statistics and with the mean prior of the existing terms
+        state.sstats = np.hstack([state.sstats, np.zeros((state.sstats.shape[0], num_new_terms), dtype=state.sstats.dtype)])
+        eta_fill = np.full(num_new_terms, np.mean(lda_model.eta), dtype=lda_model.eta.dtype)
+        lda_model.eta = np.concatenate([lda_model.eta, eta_fill])
+        state.eta = np.concatenate([state.eta, eta_fill.astype(state.eta.dtype)])
+        lda_model.num_terms = len(dictionary)
+    lda_model.id2word = dictionary
+    lda_model.sync_state()
+
+# Function to add new documents of a time span to existing results without retraining from scratch
+def update_documents(folder_path, results, tagging_mode='exact', batch_size=64, workers=1, passes=None):
+    if 'source_files' not in results or 'lemma_counts' not in results:
+        raise ValueError("Results have no source file list or lemma counts, run a full process_documents once")
+
+    source_files = list(results['source_files'])
+    new_files = find_new_files(folder_path, source_files)
+    if not new_files:
+        print("No new documents")
+        return results, []
+
+    # Only the new files are parsed and preprocessed
+    new_docs = preprocess_files(new_files, workers=workers, batch_size=batch_size, tagging_mode=tagging_mode)
+
+    lda_model = results['lda_model']
+    dictionary = lda_model.id2word
+    admitted = extend_dictionary(dictionary, new_docs, results['lemma_counts'])
+    extend_lda_vocabulary(lda_model, dictionary)
+    print(f"Dictionary: {len(admitted)} new tokens admitted, {len(dictionary)} tokens in total")
+
+    # Online update of the model with the TF-IDF weighted new documents, the IDF weights come from the
+    # document frequencies the dictionary now holds for old and new documents together
+    new_corpus = [dictionary.doc2bow(doc) for doc in new_docs]
+    tfidf = models.TfidfModel(dictionary=dictionary)
+    start = time.perf_counter()
+    lda_model.update(tfidf[new_corpus], passes=passes)
+    print(f"LDA update: {len(new_docs)} documents in {time.perf_counter() - start:.1f}s")
+
+    # Top words after the update, topics whose top words changed affect the comparison of old documents too
+    topn = len(next(iter(results['top_words_per_topic'].values()), [])) or 25
+    top_words_per_topic = {topic_id: [word for word, prob in lda_model.show_topic(topic_id, topn=topn)]
+                           for topic_id in range(lda_model.num_topics)}
+    changed_topics = {topic_id for topic_id, words in top_words_per_topic.items()
+                      if words != results['top_words_per_topic'].get(topic_id)}
+
+    # Dominant topics are only inferred for the new documents
+    new_doc_topics = document_topic_matrix(lda_model, new_corpus)
+    dominant_topics_per_doc = list(results['dominant_topics_per_doc'])
+    dominant_topics_per_doc += dominant_topics_from_matrix(new_doc_topics, dominance_threshold=0.2)
+
+    # The global frequency threshold is maintained from the stored counts instead of all token lists
+    old_num_docs = len(dominant_topics_per_doc) - len(new_docs)
+    old_common_lemmas = find_common_lemmas(results['lemma_counts'], old_num_docs)
+    lemma_counts = dict(results['lemma_counts'])
+    for doc in new_docs:
+        for token in doc:
+            lemma_counts[token] = lemma_counts.get(token, 0) + 1
+    common_lemmas = find_common_lemmas(lemma_counts, len(dominant_topics_per_doc))
+
+    # Affected documents: the new ones, and old ones whose dominant topics changed their top words
+    # (all of them if the set of excluded common lemmas changed)
+    prep_docs = list(results['prep_docs']) + new_docs
+    if common_lemmas != old_common_lemmas:
+        affected = list(range(len(prep_docs)))
+    else:
+        affected = [doc_id for doc_id in range(old_num_docs)
+                    if changed_topics.intersection(dominant_topics_per_doc[doc_id])]
+        affected += list(range(old_num_docs, len(prep_docs)))
+
+    comparison_results = list(results['comparison_results'])
+    updated = compare_lemmas_with_topics(prep_docs, top_words_per_topic, dominant_topics_per_doc,
+                                         common_lemmas=common_lemmas, doc_ids=affected)
+    for result in updated:
+        if result['document'] < len(comparison_results):
+            comparison_results[result['document']] = result
+        else:
+            comparison_results.append(result)
+    print(f"Comparison: {len(affected)} of {len(prep_docs)} documents recomputed")
+
+    training_stats = dict(results.get('training_stats') or {})
+    training_stats['incremental_updates'] = training_stats.get('incremental_updates', 0) + 1
+
+    updated_results = {
+        'prep_docs': prep_docs,
+        'top_words_per_topic': top_words_per_topic,
+        'dominant_topics_per_doc': dominant_topics_per_doc,
+        'comparison_results': comparison_results,
+        'lda_model': lda_model,
+        'training_stats': training_stats,
+        'source_files': source_files + [os.path.relpath(file_path, folder_path) for file_path in new_files],
+        'lemma_counts': lemma_counts
+    }
+    return updated_results, new_files
+
+# Function to load results, with a writable model since the memory-mapped one of a store cannot be updated
+def load_updatable_results(results_path):
+    if os.path.isdir(results_path):
+        store = ResultsStore(results_path)
+        results = {key: store[key] for key in store.keys() if key != 'lda_model'}
+        results['lda_model'] = models.LdaModel.load(os.path.join(results_path, MODEL_FILE))
+        return results
+    with open(results_path, 'rb') as f:
+        return pickle.load(f)
+
+# Function to update a saved results pickle file or results store with the new documents of its folder
+def update_results_file(folder_path, results_path, **options):
+    results = load_updatable_results(results_path)
+    updated_results, new_files = update_documents(folder_path, results, **options)
+    if new_files:
+        if os.path.isdir(results_path):
+            save_results_store(updated_results, results_path)
+        else:
+            save_results(updated_results, results_path)
+    return new_files
+
+# Command line entry point, e.g. python incremental.py path/2021-2025 topic_model_results_2021-2025.pkl
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Add new .xmi files of a time span to its existing results.",
+        epilog="Only the new files are preprocessed. Existing dictionary ids are kept, tokens the full run filtered out "
+               "stay excluded, and unseen tokens are admitted unless they occur in more than half of all documents. "
+               "The model is grown to the new vocabulary and updated online. Comparison results are recomputed for "
+               "the new documents and for old documents whose dominant topics changed their top words.")
+    parser.add_argument('folder_path', help="Folder of the time span with the old and new .xmi files")
+    parser.add_argument('results_path', help="Results pickle file or results store directory of the folder")
+    parser.add_argument('--tagging-mode', choices=TAGGING_MODES, default='exact',
+                        help="Must match the tagging mode of the full run")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--passes', type=int, default=None, help="Update passes over the new documents (default: as trained)")
+    args = parser.parse_args(argv)
+    update_results_file(args.folder_path, args.results_path, tagging_mode=args.tagging_mode,
+                        workers=args.workers, passes=args.passes)
+    return 0
+
+## Main execution point
+if __name__ == '__main__':
+    sys.exit(main())
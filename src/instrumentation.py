@@ -0,0 +1,183 @@
+import os
+import csv
+import json
+import time
+import cProfile
+import resource
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Stages timed across the pipeline, in pipeline order
+STAGES = ('xml_parse', 'normalize', 'tokenize', 'pos_tagging', 'stopwords', 'lemmatize', 'dictionary', 'tfidf',
+          'lda_training', 'dominant_topics', 'comparison', 'save')
+
+STAGE_COLUMNS = ('calls', 'seconds', 'self_seconds', 'peak_traced_mb', 'max_rss_mb')
+
+# Function to read the peak resident set size of this process in MB (ru_maxrss is in KB on Linux)
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# Profiler that does nothing, used while no run is being instrumented so the hooks cost next to nothing
+class NullProfiler:
+    enabled = False
+
+    def stage(self, name):
+        return nullcontext()
+
+    def count(self, name, value=1):
+        pass
+
+    def record_document(self, name, **counters):
+        pass
+
+# Collects time, memory and counters per stage, plus per-document counters
+class StageProfiler:
+    enabled = True
+
+    def __init__(self, trace_memory=False, profile_stage=None, profile_path=None):
+        self.trace_memory = trace_memory
+        self.profile_stage = profile_stage
+        self.profile_path = profile_path
+        self.stages = {}
+        self.counters = {}
+        self.documents = []
+        self._stack = []
+        self._cprofile = cProfile.Profile() if profile_stage is not None else None
+        self._profiled_calls = 0
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # Settings needed to set up an equivalent profiler in a pool worker
+    def options(self):
+        return {'trace_memory': self.trace_memory, 'profile_stage': self.profile_stage, 'profile_path': self.profile_path}
+
+    # Time (and trace memory of) a stage, time spent in nested stages is excluded from its self time
+    @contextmanager
+    def stage(self, name):
+        frame = {'child_seconds': 0.0, 'max_peak': 0, 'start_memory': 0}
+        if self.trace_memory:
+            frame['start_memory'] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        profiling = self._cprofile is not None and name == self.profile_stage
+        self._stack.append(frame)
+        if profiling:
+            self._profiled_calls += 1
+            self._cprofile.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if profiling:
+                self._cprofile.disable()
+            self._stack.pop()
+
+            stats = self.stages.setdefault(name, dict.fromkeys(STAGE_COLUMNS, 0))
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['self_seconds'] += seconds - frame['child_seconds']
+            stats['max_rss_mb'] = max(stats['max_rss_mb'], max_rss_mb())
+            if self.trace_memory:
+                # The peak was reset for this stage, so the parent has to remember the larger of both peaks
+                peak = max(frame['max_peak'], tracemalloc.get_traced_memory()[1])
+                stats['peak_traced_mb'] = max(stats['peak_traced_mb'], (peak - frame['start_memory']) / 2 ** 20)
+            if self._stack:
+                parent = self._stack[-1]
+                parent['child_seconds'] += seconds
+                if self.trace_memory:
+                    parent['max_peak'] = max(parent['max_peak'], peak)
+
+    # Add to a run-level counter such as the number of documents or tokens
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    # Record the counters of one document
+    def record_document(self, name, **counters):
+        self.documents.append(dict(counters, document=name))
+        for counter, value in counters.items():
+            self.count(counter, value)
+
+    # Function to hand the collected data of a pool worker back to the parent and start over
+    def pop_snapshot(self):
+        if self._profiled_calls and self.profile_path is not None:
+            # Each worker process writes its own cumulative dump, pstats can combine them
+            self._cprofile.dump_stats(f"{self.profile_path}.{os.getpid()}")
+        snapshot = {'stages': self.stages, 'counters': self.counters, 'documents': self.documents}
+        self.stages, self.counters, self.documents = {}, {}, []
+        return snapshot
+
+    # Function to merge the data of a pool worker into this profiler, times are summed over the workers
+    def merge(self, snapshot):
+        for name, worker_stats in snapshot['stages'].items():
+            stats = self.stages.setdefault(name, dict.fromkeys(STAGE_COLUMNS, 0))
+            for column in ('calls', 'seconds', 'self_seconds'):
+                stats[column] += worker_stats[column]
+            for column in ('peak_traced_mb', 'max_rss_mb'):
+                stats[column] = max(stats[column], worker_stats[column])
+        for name, value in snapshot['counters'].items():
+            self.count(name, value)
+        self.documents.extend(snapshot['documents'])
+
+    # Function to write the cProfile statistics of the selected stage (readable with pstats or snakeviz),
+    # nothing is written when the stage only ran in pool workers, which write their own '.<pid>' dumps
+    def dump_profile(self, path=None):
+        path = path or self.profile_path
+        if self._profiled_calls and path is not None:
+            self._cprofile.dump_stats(path)
+
+    # Function to build the report of this run, stages in pipeline order
+    def report(self):
+        ordered = [name for name in STAGES if name in self.stages]
+        ordered += sorted(name for name in self.stages if name not in STAGES)
+        return {
+            'stages': {name: self.stages[name] for name in ordered},
+            'counters': dict(self.counters),
+            'documents': list(self.documents),
+            'max_rss_mb': max_rss_mb()
+        }
+
+# Profiler of this process, the hooks in the pipeline report to it
+_profiler = NullProfiler()
+
+# Function to get the profiler of this process
+def get_profiler():
+    return _profiler
+
+# Function to install a profiler for this process, returns the previous one
+def set_profiler(profiler):
+    global _profiler
+    previous, _profiler = _profiler, profiler or NullProfiler()
+    return previous
+
+# Function to write the reports of several folders as one JSON or CSV run report
+# (CSV: one row per folder and stage, the per-document counters go to a second '_documents.csv' file)
+def write_run_report(reports, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(('folder', 'stage') + STAGE_COLUMNS)
+            for folder, report in reports.items():
+                for name, stats in report['stages'].items():
+                    writer.writerow((folder, name) + tuple(stats[column] for column in STAGE_COLUMNS))
+
+        counter_names = sorted({counter for report in reports.values() for document in report['documents']
+                                for counter in document if counter != 'document'})
+        with open(path[:-len('.csv')] + '_documents.csv', 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['folder', 'document'] + counter_names)
+            for folder, report in reports.items():
+                for document in report['documents']:
+                    writer.writerow([folder, document['document']] + [document.get(name, '') for name in counter_names])
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'folders': reports}, f, indent=2)
+
+# Function to print the stage table of a report
+def print_report(report, title=''):
+    print(f"{title:<16} {'calls':>7} {'seconds':>9} {'self':>9} {'traced MB':>10} {'max RSS MB':>11}")
+    for name, stats in report['stages'].items():
+        print(f"{name:<16} {stats['calls']:>7} {stats['seconds']:>9.2f} {stats['self_seconds']:>9.2f} "
+              f"{stats['peak_traced_mb']:>10.1f} {stats['max_rss_mb']:>11.1f}")
+    for name, value in report['counters'].items():
+        print(f"{name}: {value}")
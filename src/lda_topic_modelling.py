@@ -1,76 +1,81 @@
-import gensim
-from gensim import corpora, models
-from itertools import chain
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
-import xml.etree.ElementTree as ET
 import os
-from collections import Counter
 import pickle
-import string
-import re
+import hashlib
+import json
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from xmi_reader import find_xmi_files, read_sofa_text
+from preprocessing import TAGGING_MODES, get_preprocessor, preprocess_files, iter_preprocess_files
+from token_cache import TokenCache, shard_name
+from lda_training import LDA_ENGINES, train_lda_model
+from results_store import save_results_store
+from instrumentation import STAGES, StageProfiler, get_profiler, set_profiler, write_run_report, print_report
+from topic_comparison import (document_topic_matrix, dominant_topics_from_matrix, compare_lemmas_with_topics,
+                              count_lemmas, find_common_lemmas)
 
 # Function to parse the XML file and extract raw text for processing
-def extract_raw_text(file_path):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-
-    # Locate the raw text using the UIMA namespace and return processed text
-    raw_text = root.find('.//cas:Sofa', namespaces={'cas': 'http:///uima/cas.ecore'}).get('sofaString')
+def extract_raw_text(file_path, preprocessor=None):
+    # Stream the file up to the cas:Sofa element instead of building the whole CAS tree
+    raw_text = read_sofa_text(file_path)
     
-    return prepare_text(raw_text)
+    return prepare_text(raw_text, preprocessor)
     
 # Function to prepare and preprocess raw text for topic modeling
-def prepare_text(raw_text):
-    
-    # Convert text to lowercase and remove punctuation
-    normalized_text = raw_text.lower()
-    normalized_text = normalized_text.translate(str.maketrans("","",string.punctuation))
-    normalized_text = re.sub(r"[^a-zA-Züäöß\s]", "", normalized_text)
-
-    # Tokenize the normalized text
-    tokens = word_tokenize(normalized_text)
-
-    # Apply POS tagging and retain only nouns, verbs, and ajdectives
-    pos_tags = nltk.pos_tag(tokens, tagset='universal')
-    pos_tags_to_keep = {"NOUN", "VERB", "ADJ"}
-    filtered_tokens = [word for word, pos in pos_tags if pos in pos_tags_to_keep]
-
-    # Remove stopwords
-    stop_words = set(stopwords.words('german'))
-    filtered_text = [word for word in filtered_tokens if word.lower() not in stop_words]
-
-    # Lemmatize the remaining tokens
-    lemmatizer = WordNetLemmatizer()
-    lemmatized_text = [lemmatizer.lemmatize(word) for word in filtered_text]
-    
-    return lemmatized_text
+def prepare_text(raw_text, preprocessor=None):
+    # Reuse the process-wide pipeline so stopwords, lemmatizer and lemma cache are only set up once
+    if preprocessor is None:
+        preprocessor = get_preprocessor()
+    return preprocessor.prepare(raw_text)
 
 # Function to process documents in a folder and apply topic modeling
-    def process_documents(folder_path, topn=25):
-    prep_docs = []
-    
+def process_documents(folder_path, topn=25, tagging_mode='exact', batch_size=64, workers=1, cache_dir=None,
+                      stream_dir=None, engine='single', lda_options=None):
+    # gensim is imported here rather than at module level so the scheduler and CLI start quickly
+    from gensim import corpora, models
+    from streaming_corpus import build_streaming_corpus
+    profiler = get_profiler()
+
     # Walk through all .xmi files in the folder
-    for root, dirs, files in os.walk(folder_path):
-        for file in files:
-            if file.endswith('.xmi'):
-                file_path = os.path.join(root, file)
-                print(f"Processing file: {file_path}")
-                prep_docs.append(extract_raw_text(file_path))
+    file_paths = find_xmi_files(folder_path)
+
+    # Preprocess the documents in batches, on a process pool if more than one worker is requested
+    if stream_dir is not None:
+        if cache_dir is not None:
+            raise ValueError("The token cache keeps a whole folder in memory and cannot be combined with stream_dir")
+
+        # Streaming mode: documents go straight to disk, the dictionary is built incrementally and the
+        # BoW corpus is serialized to a Matrix Market file that all later passes read from
+        docs = iter_preprocess_files(file_paths, workers=workers, batch_size=batch_size, tagging_mode=tagging_mode)
+        # Preprocessing runs inside this stage, its own stages are subtracted from the dictionary self time
+        with profiler.stage('dictionary'):
+            prep_docs, dictionary, corpus = build_streaming_corpus(docs, stream_dir)
+    else:
+        if cache_dir is None:
+            prep_docs = preprocess_files(file_paths, workers=workers, batch_size=batch_size, tagging_mode=tagging_mode)
+        else:
+            # Reuse token lists of unchanged files from earlier runs with the same preprocessing settings
+            token_cache = TokenCache(cache_dir, tagging_mode=tagging_mode)
+            prep_docs = token_cache.preprocess_files(file_paths, shard_name(folder_path), workers=workers, batch_size=batch_size)
+            print(f"Token cache: {token_cache.hits} hits, {token_cache.misses} misses")
 
-    # Create a dictionary from preprocessed documents
-    dictionary = corpora.Dictionary(prep_docs)
-    dictionary.filter_extremes(no_below=1, no_above=0.5)
+        with profiler.stage('dictionary'):
+            # Create a dictionary from preprocessed documents
+            dictionary = corpora.Dictionary(prep_docs)
+            dictionary.filter_extremes(no_below=1, no_above=0.5)
 
-    # Convert documents to Bag of Words (BoW) format
-    corpus = [dictionary.doc2bow(doc) for doc in prep_docs]
+            # Convert documents to Bag of Words (BoW) format
+            corpus = [dictionary.doc2bow(doc) for doc in prep_docs]
+    profiler.count('dictionary_size', len(dictionary))
     
     # Apply TF-IDF transformation and train the LDA Model
-    tfidf = models.TfidfModel(corpus)
-    corpus_tfidf = tfidf[corpus]
-    lda_model = models.LdaModel(corpus_tfidf, num_topics=15, id2word=dictionary, passes=20, eta=0.15)
+    with profiler.stage('tfidf'):
+        tfidf = models.TfidfModel(corpus)
+        corpus_tfidf = tfidf[corpus]
+    with profiler.stage('lda_training'):
+        lda_model, training_stats = train_lda_model(corpus_tfidf, dictionary, engine=engine, **(lda_options or {}))
+    print(f"LDA training ({training_stats['engine']}): {training_stats['seconds']:.1f}s, "
+          f"{training_stats['passes']} passes, perplexity {training_stats['perplexity']:.1f}")
 
     # Extract top words for each topic
     top_words_per_topic = {}
@@ -78,41 +83,20 @@ def prepare_text(raw_text):
         top_words = lda_model.show_topic(topic_id, topn=topn)
         top_words_per_topic[topic_id] = [word for word, prob in top_words]
     
-    # Identify dominant topics for each document based on topic contribution
-    dominant_topics_per_doc = []
-    dominance_threshold = 0.2    # Minimum topic contribution threshold
-    for doc_id, doc_topics in enumerate(lda_model[corpus]):
-        sorted_topics = sorted(doc_topics, key=lambda x: x[1], reverse=True)
-        dominant_topics = [topic[0] for topic in sorted_topics if topic[1] >= dominance_threshold]
-        if not dominant_topics:
-            dominant_topics = [sorted_topics[0][0]]    # Use top topic if none meet the threshold
-        dominant_topics_per_doc.append(dominant_topics)
-
-    # Lemma frequency analysis and comparison
-    flattened_lemmas = list(chain.from_iterable(prep_docs))
-    lemma_counter = Counter(flattened_lemmas)
-
-    # Define frequency threshold to exclude overly common lemmas
-    frequency_threshold = 0.5 * len(prep_docs)
-    common_lemmas = {lemma for lemma, count in lemma_counter.items() if count > frequency_threshold}
-
-    # Filter common lemmas out of the documents
-    filtered_docs = [[lemma for lemma in doc if lemma not in common_lemmas] for doc in prep_docs]
-    
-    # Perform comparison between most frequent lemmas and topic words
-    comparison_results = []
-    for doc_id, lemmas in enumerate(filtered_docs):
-        dominant_topics = dominant_topics_per_doc[doc_id]
-        common_words = set()
-        for dominant_topic in dominant_topics:
-            topic_words = top_words_per_topic[dominant_topic]
-            common_words.update(set(lemmas).intersection(set(topic_words)))
-        comparison_results.append({
-            'document': doc_id,
-            'dominant_topics': dominant_topics,
-            'most_frequent_lemmas': Counter(lemmas).most_common(10),    # Top 10 most frequent lemmas
-            'common_words': list(common_words)    # Words common between topics and lemmas
-        })
+    # Identify dominant topics for each document from the batched document x topic matrix
+    with profiler.stage('dominant_topics'):
+        # Same chunk size as the training, so streaming mode holds no more documents here than during training
+        doc_topics = document_topic_matrix(lda_model, corpus, chunksize=(lda_options or {}).get('chunksize', 2000))
+        dominant_topics_per_doc = dominant_topics_from_matrix(doc_topics, dominance_threshold=0.2)
+
+    with profiler.stage('comparison'):
+        # Lemma frequency analysis, the counts are kept so later incremental updates need not recount all documents
+        lemma_counts = count_lemmas(prep_docs)
+        common_lemmas = find_common_lemmas(lemma_counts, len(prep_docs))
+
+        # Comparison between most frequent lemmas and topic words
+        comparison_results = compare_lemmas_with_topics(prep_docs, top_words_per_topic, dominant_topics_per_doc,
+                                                        common_lemmas=common_lemmas)
 
     # Return all the results for further processing or saving
     return {
@@ -120,23 +104,193 @@ def prepare_text(raw_text):
         'top_words_per_topic': top_words_per_topic,
         'dominant_topics_per_doc': dominant_topics_per_doc,
         'comparison_results': comparison_results,
-        'lda_model': lda_model
+        'lda_model': lda_model,
+        'training_stats': training_stats,
+        'source_files': [os.path.relpath(file_path, folder_path) for file_path in file_paths],
+        'lemma_counts': dict(lemma_counts)
     }
 
 # Function to save results using pickle
 def save_results(results, filename):
-    with open(filename, 'wb') as f:
+    # Write to a temporary file first so a crash never leaves a truncated results file behind
+    temp_filename = filename + '.tmp'
+    with open(temp_filename, 'wb') as f:
         pickle.dump(results, f)
+    os.replace(temp_filename, filename)
+
+# Options that only change how a folder is processed, not its results
+EXECUTION_OPTIONS = ('workers', 'batch_size', 'cache_dir', 'stream_dir')
+# Same for the LDA options, the LdaMulticore worker count follows the CPU budget
+LDA_EXECUTION_OPTIONS = ('workers',)
+
+# Function to fingerprint the .xmi files of a folder together with the processing options
+def folder_fingerprint(folder_path, options):
+    digest = hashlib.sha256()
+    for root, dirs, files in sorted(os.walk(folder_path)):
+        for file in sorted(files):
+            if file.endswith('.xmi'):
+                stat = os.stat(os.path.join(root, file))
+                digest.update(f"{os.path.relpath(os.path.join(root, file), folder_path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode('utf-8'))
+    result_options = {key: value for key, value in options.items() if key not in EXECUTION_OPTIONS}
+    if result_options.get('lda_options'):
+        result_options['lda_options'] = {key: value for key, value in result_options['lda_options'].items()
+                                         if key not in LDA_EXECUTION_OPTIONS}
+    digest.update(json.dumps(result_options, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+# Function to load the manifest of completed folders
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding='utf-8') as f:
+        return json.load(f)
+
+# Function to write the manifest atomically
+def save_manifest(manifest, manifest_path):
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+# Function to process one folder and save its results, runs inside a scheduler worker
+# With profiler_options the folder is instrumented and its stage report is returned next to the results path
+def process_folder(folder_path, results_path, options, results_format='pickle', profiler_options=None):
+    print(f"Processing folder: {os.path.basename(folder_path)}")
+    profiler = StageProfiler(**profiler_options) if profiler_options is not None else None
+    previous_profiler = set_profiler(profiler)
+    try:
+        results = process_documents(folder_path, **options)
+        with get_profiler().stage('save'):
+            if results_format == 'store':
+                save_results_store(results, results_path)
+            else:
+                save_results(results, results_path)
+    finally:
+        set_profiler(previous_profiler)
+
+    if profiler is None:
+        return results_path, None
+    profiler.dump_profile()
+    return results_path, profiler.report()
+
+# Function to split the CPU budget between concurrently running folders and their worker pools
+def plan_cpu_budget(num_folders, cpu_budget=None, parallel_folders=1):
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    concurrent_folders = max(1, min(parallel_folders, num_folders, cpu_budget))
+    workers_per_folder = max(1, cpu_budget // concurrent_folders)
+    return concurrent_folders, workers_per_folder
 
 # Function to process all folders in a given directory
-def process_all_folders(base_directory):
-    for folder in os.listdir(base_directory):
+def process_all_folders(base_directory, output_dir='.', parallel_folders=1, cpu_budget=None, force=False,
+                        results_format='pickle', profile_report=None, trace_memory=False, profile_stage=None, **options):
+    folders = sorted(folder for folder in os.listdir(base_directory)
+                     if os.path.isdir(os.path.join(base_directory, folder)))    # Ensure it's a directory
+    concurrent_folders, workers_per_folder = plan_cpu_budget(len(folders), cpu_budget, parallel_folders)
+
+    # Worker pools inside each folder share the CPU budget unless set explicitly
+    options.setdefault('workers', workers_per_folder)
+    if options.get('engine') == 'multicore':
+        options['lda_options'] = dict(options.get('lda_options') or {})
+        options['lda_options'].setdefault('workers', max(1, workers_per_folder - 1))
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    manifest = load_manifest(manifest_path)
+
+    # Skip folders whose results are complete and whose input files and options did not change
+    pending = {}
+    for folder in folders:
         folder_path = os.path.join(base_directory, folder)
-        if os.path.isdir(folder_path):  # Ensure it's a directory
-            print(f"Processing folder: {folder}")
-            results = process_documents(folder_path)
-            file_name = "topic_model_results_" + folder + ".pkl"
-            save_results(results, file_name)
+        results_path = os.path.join(output_dir, "topic_model_results_" + folder)
+        if results_format == 'pickle':
+            results_path += ".pkl"
+        folder_options = dict(options)
+        if folder_options.get('stream_dir') is not None:
+            folder_options['stream_dir'] = os.path.join(folder_options['stream_dir'], folder)
+        fingerprint = folder_fingerprint(folder_path, folder_options)
+
+        entry = manifest.get(folder)
+        if not force and entry and entry['fingerprint'] == fingerprint and os.path.exists(results_path):
+            print(f"Skipping folder: {folder} (unchanged)")
+            continue
+        pending[folder] = (folder_path, results_path, folder_options, fingerprint)
+
+    # Instrumentation settings per folder, cProfile dumps of the selected stage are written next to the run report
+    def profiler_options(folder):
+        if profile_report is None:
+            return None
+        profile_path = None
+        if profile_stage is not None:
+            profile_path = f"{os.path.splitext(profile_report)[0]}_{folder}_{profile_stage}.prof"
+        return {'trace_memory': trace_memory, 'profile_stage': profile_stage, 'profile_path': profile_path}
+
+    failed = []
+    reports = {}
+    with ProcessPoolExecutor(max_workers=concurrent_folders) as executor:
+        futures = {executor.submit(process_folder, folder_path, results_path, folder_options, results_format,
+                                   profiler_options(folder)): folder
+                   for folder, (folder_path, results_path, folder_options, fingerprint) in pending.items()}
+        for future in as_completed(futures):
+            folder = futures[future]
+            try:
+                results_path, report = future.result()
+            except Exception as error:
+                # Keep going with the other folders, a rerun only has to redo the failed ones
+                print(f"Failed folder: {folder} ({error!r})")
+                failed.append(folder)
+                continue
+            manifest[folder] = {'fingerprint': pending[folder][3], 'results_file': os.path.basename(results_path)}
+            save_manifest(manifest, manifest_path)
+            if report is not None:
+                print_report(report, title=folder)
+                reports[folder] = report
+
+    if profile_report is not None and reports:
+        write_run_report(dict(sorted(reports.items())), profile_report)
+
+    return failed
+
+# Command line entry point
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run LDA topic modeling on every subfolder of .xmi files.")
+    parser.add_argument('base_directory', help="Main directory with one subfolder per time span")
+    parser.add_argument('--output-dir', default='.', help="Where the results pickle files and manifest are written")
+    parser.add_argument('--parallel-folders', type=int, default=1, help="Number of folders processed at the same time")
+    parser.add_argument('--cpu-budget', type=int, default=None, help="CPUs shared by all folders (default: all)")
+    parser.add_argument('--topn', type=int, default=25, help="Number of top words per topic")
+    parser.add_argument('--tagging-mode', choices=TAGGING_MODES, default='exact')
+    parser.add_argument('--engine', choices=LDA_ENGINES, default='single')
+    parser.add_argument('--num-topics', type=int, default=None, help="Number of LDA topics (default: 15, see sweep.py)")
+    parser.add_argument('--passes', type=int, default=None, help="Number of LDA passes (default: 20)")
+    parser.add_argument('--eta', type=float, default=None, help="Topic-word prior of the LDA model (default: 0.15)")
+    parser.add_argument('--cache-dir', default=None, help="Directory of the preprocessed token cache")
+    parser.add_argument('--stream-dir', default=None, help="Directory for the out-of-core streaming corpus, "
+                        "the results refer to its token files and need it to stay in place")
+    parser.add_argument('--results-format', choices=('pickle', 'store'), default='pickle',
+                        help="Single pickle file or a lazily loadable results store directory per folder")
+    parser.add_argument('--force', action='store_true', help="Reprocess folders that are already complete")
+    parser.add_argument('--profile-report', default=None,
+                        help="Write a per-stage time/memory run report with document and token counts to this "
+                             ".json or .csv file (without it the profiling hooks do nothing)")
+    parser.add_argument('--trace-memory', action='store_true', help="Trace the peak Python memory of every stage (slower)")
+    parser.add_argument('--profile-stage', choices=STAGES, default=None,
+                        help="Dump cProfile statistics of this stage next to the run report (one dump per pool worker "
+                             "when the stage runs in workers)")
+    args = parser.parse_args(argv)
+    lda_options = {key: value for key, value in (('num_topics', args.num_topics), ('passes', args.passes), ('eta', args.eta))
+                   if value is not None}
+
+    failed = process_all_folders(args.base_directory, output_dir=args.output_dir, parallel_folders=args.parallel_folders,
+                                 cpu_budget=args.cpu_budget, force=args.force, results_format=args.results_format,
+                                 profile_report=args.profile_report, trace_memory=args.trace_memory,
+                                 profile_stage=args.profile_stage,
+                                 topn=args.topn,
+                                 tagging_mode=args.tagging_mode, engine=args.engine, cache_dir=args.cache_dir,
+                                 stream_dir=args.stream_dir, lda_options=lda_options or None)
+    if failed:
+        print(f"Failed folders: {', '.join(sorted(failed))}")
+        return 1
+    return 0
 
 """ # Main execution point for one folder
 folder_path = 'your/folder/path'    # Update with actual folder path
@@ -144,6 +298,6 @@ results = process_documents(folder_path, topn=25)    # Process the folder
 save_results(results, 'results.pkl')    # Save the results to a pickle file
  """
 
-# Main execution point for multiple subfolders
-base_directory = 'your/folder/path'  # Update with main directory with subfolders
-process_all_folders(base_directory)
+# Main execution point for multiple subfolders, e.g. python lda_topic_modelling.py your/folder/path --parallel-folders 4
+if __name__ == '__main__':
+    sys.exit(main())
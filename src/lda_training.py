@@ -0,0 +1,72 @@
+import time
+import numpy as np
+
+# Available training engines: gensim's single-threaded LdaModel, LdaMulticore and online training with early stopping
+LDA_ENGINES = ('single', 'multicore', 'online')
+
+# Function to compute the perplexity of a model on a corpus
+def compute_perplexity(lda_model, corpus):
+    return float(np.exp2(-lda_model.log_perplexity(corpus)))
+
+# Function to run further passes of a trained model over the corpus it was trained on
+# LdaModel.update() counts the corpus as new documents (state.numdocs grows, so the topic statistics are scaled up
+# and the learning rate decays as if more data had arrived); both counters are restored so the passes act like the
+# extra passes of a single LdaModel run
+def continue_training(lda_model, corpus, passes=1, passes_done=1, **update_options):
+    numdocs, num_updates = lda_model.state.numdocs, lda_model.num_updates
+    lda_model.update(corpus, passes=passes, offset=lda_model.offset + passes_done, **update_options)
+    lda_model.state.numdocs, lda_model.num_updates = numdocs, num_updates
+
+# Function to train an LDA model with the selected engine and report how the training went
+def train_lda_model(corpus, dictionary, engine='single', num_topics=15, passes=20, eta=0.15, workers=None,
+                    chunksize=2000, update_every=1, convergence_tol=0.001, random_state=None):
+    if engine not in LDA_ENGINES:
+        raise ValueError(f"Unknown LDA engine '{engine}', expected one of {LDA_ENGINES}")
+
+    # gensim is only imported when a model is actually trained
+    from gensim import models
+
+    # Perplexity evaluations are timed separately and kept out of `seconds`, so engines compare on training time only
+    eval_seconds = 0.0
+    def evaluate():
+        nonlocal eval_seconds
+        eval_start = time.perf_counter()
+        perplexity = compute_perplexity(lda_model, corpus)
+        eval_seconds += time.perf_counter() - eval_start
+        return perplexity
+
+    start = time.perf_counter()
+    if engine == 'single':
+        lda_model = models.LdaModel(corpus, num_topics=num_topics, id2word=dictionary, passes=passes, eta=eta,
+                                    chunksize=chunksize, update_every=update_every, random_state=random_state)
+        passes_run = passes
+    elif engine == 'multicore':
+        lda_model = models.LdaMulticore(corpus, num_topics=num_topics, id2word=dictionary, passes=passes, eta=eta,
+                                        workers=workers, chunksize=chunksize, random_state=random_state)
+        passes_run = passes
+    else:
+        # Online training, one pass at a time until the perplexity stops improving (at most `passes` passes)
+        lda_model = models.LdaModel(corpus, num_topics=num_topics, id2word=dictionary, passes=1, eta=eta,
+                                    chunksize=chunksize, update_every=update_every, random_state=random_state)
+        passes_run = 1
+        perplexity = evaluate()
+        while passes_run < passes:
+            continue_training(lda_model, corpus, passes_done=passes_run, chunksize=chunksize, update_every=update_every)
+            passes_run += 1
+            previous_perplexity, perplexity = perplexity, evaluate()
+            if abs(previous_perplexity - perplexity) / previous_perplexity < convergence_tol:
+                break
+    seconds = time.perf_counter() - start - eval_seconds
+
+    # The online engine already evaluated its final model
+    if engine != 'online':
+        perplexity = evaluate()
+
+    training_stats = {
+        'engine': engine,
+        'seconds': seconds,
+        'eval_seconds': eval_seconds,
+        'passes': passes_run,
+        'perplexity': perplexity
+    }
+    return lda_model, training_stats
@@ -0,0 +1,150 @@
+import os
+import sys
+import glob
+import argparse
+import pickle
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from results_store import load_results
+from comparison_index import index_comparison_file
+
+# Bump when the metric definitions change so cached metrics are recomputed
+METRICS_VERSION = 1
+
+# Function to compute all per-document and global metrics of a results dict in one pass
+def compute_metrics(results):
+    comparison_results = results['comparison_results']
+    top_words_per_topic = results['top_words_per_topic']
+    num_docs = len(comparison_results)
+
+    documents = np.empty(num_docs, dtype=np.int64)
+    num_common = np.zeros(num_docs, dtype=np.int64)
+    num_union = np.zeros(num_docs, dtype=np.int64)
+    most_frequent_lemmas = set()
+    used_topics = set()
+
+    for position, result in enumerate(comparison_results):
+        lemmas = {lemma for lemma, count in result['most_frequent_lemmas']}
+        common_words = set(result['common_words'])
+        documents[position] = result['document']
+        num_common[position] = len(common_words)
+        num_union[position] = len(lemmas) + len(common_words) - len(lemmas & common_words)
+        most_frequent_lemmas.update(lemmas)
+        used_topics.update(result['dominant_topics'])
+
+    # Jaccard similarity between the most frequent lemmas and the common words of each document
+    jaccard_similarities = np.divide(num_common, num_union, out=np.zeros(num_docs), where=num_union > 0)
+
+    # Topic words of every topic that is dominant in at least one document, each topic is only visited once
+    all_topic_words = set()
+    for topic in used_topics:
+        all_topic_words.update(top_words_per_topic[topic])
+    intersection_size = len(most_frequent_lemmas & all_topic_words)
+    total_topic_words = len(all_topic_words)
+
+    return {
+        'documents': documents,
+        'jaccard_similarities': jaccard_similarities,
+        'global_jaccard_similarity': float(jaccard_similarities.mean()) if num_docs > 0 else 0,
+        'num_docs': num_docs,
+        'num_most_frequent_lemmas': len(most_frequent_lemmas),
+        'num_topic_words': total_topic_words,
+        'intersection_size': intersection_size,
+        'topic_intersection_ratio': (intersection_size / total_topic_words * 100) if total_topic_words > 0 else 0
+    }
+
+# Function to get the path of the metrics cache stored next to a results file or store directory
+def metrics_cache_path(input_filename):
+    return input_filename.rstrip(os.sep) + '.metrics.pkl'
+
+# Function to describe the state of the input, the cache is only valid for exactly this input
+def _source_key(input_filename):
+    stat_path = input_filename
+    if os.path.isdir(input_filename):
+        stat_path = os.path.join(input_filename, 'comparison_results.parquet')
+    stat = os.stat(stat_path)
+    return (METRICS_VERSION, stat.st_size, stat.st_mtime_ns)
+
+# Function to load the metrics of a results file from the cache, computing and caching them if needed
+def load_metrics(input_filename, results=None):
+    cache_path = metrics_cache_path(input_filename)
+    source_key = _source_key(input_filename)
+    if os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached['source_key'] == source_key:
+            return cached['metrics']
+
+    if results is None:
+        results = load_results(input_filename)
+    metrics = compute_metrics(results)
+
+    temp_path = cache_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump({'source_key': source_key, 'metrics': metrics}, f)
+    os.replace(temp_path, cache_path)
+    return metrics
+
+# Function to save Jaccard similarity results and topic_intersection_ratio for cross-period comparison
+def save_comparison_data(metrics, input_filename, comparison_folder='Comparison Results'):
+    # Extract time span from input filename
+    time_span = os.path.basename(input_filename.rstrip(os.sep)).replace('results_', '').replace('.pkl', '')
+
+    # Create 'Comparison Results' folder if it doesn't exist
+    if not os.path.exists(comparison_folder):
+        os.makedirs(comparison_folder)
+
+    save_filename = os.path.join(comparison_folder, f'data_{time_span}.pkl')
+
+    # Save both Jaccard similarity and topic_intersection_ratio to file
+    save_data = {
+        'jaccard_similarities': metrics['jaccard_similarities'].tolist(),
+        'topic_intersection_ratio': metrics['topic_intersection_ratio']
+    }
+
+    with open(save_filename, 'wb') as f:
+        pickle.dump(save_data, f)
+
+    # Keep the consolidated index of the folder in step with the per-period files
+    index_comparison_file(save_filename, save_data['jaccard_similarities'], save_data['topic_intersection_ratio'])
+    return save_filename
+
+# Function to compute the metrics of one results file and write its comparison data, runs in a pool worker
+def process_results_file(input_filename, comparison_folder='Comparison Results'):
+    metrics = load_metrics(input_filename)
+    return save_comparison_data(metrics, input_filename, comparison_folder)
+
+# Function to find all results files (pickles and results store directories) in a folder
+def find_results_files(results_folder):
+    pattern = os.path.join(results_folder, '*results*')
+    return sorted(path for path in glob.glob(pattern)
+                  if (path.endswith('.pkl') and not path.endswith('.metrics.pkl'))
+                  or (os.path.isdir(path) and not path.endswith(('.tmp', '.old'))))
+
+# Function to regenerate the comparison data of every results file headlessly on a process pool
+def batch_process_results(results_folder='Results', comparison_folder='Comparison Results', workers=None):
+    input_filenames = find_results_files(results_folder)
+    if len(input_filenames) == 0:
+        print("No results files found.")
+        return []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        saved_files = list(executor.map(process_results_file, input_filenames, [comparison_folder] * len(input_filenames)))
+    for input_filename, saved_file in zip(input_filenames, saved_files):
+        print(f"{input_filename} -> {saved_file}")
+    return saved_files
+
+# Command line entry point for batch runs, e.g. python metrics.py Results "Comparison Results" --workers 4
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the metrics of every results file and write their comparison data.")
+    parser.add_argument('results_folder', nargs='?', default='Results', help="Folder with the results files")
+    parser.add_argument('comparison_folder', nargs='?', default='Comparison Results',
+                        help="Folder where the comparison data is written")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+    batch_process_results(args.results_folder, args.comparison_folder, args.workers)
+    return 0
+
+## Main execution point
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,12 @@
+# Settings of the word clouds, shared by analyze_data.py and the batch renderer
+WORDCLOUD_OPTIONS = {'width': 800, 'height': 400, 'background_color': 'white'}
+
+# Function to show a figure, or save and close it when an output path is given
+def show_or_save(fig, output_path=None):
+    # matplotlib is only imported once a figure is shown or saved, so importing this module stays cheap
+    import matplotlib.pyplot as plt
+    if output_path is None:
+        plt.show()
+    else:
+        fig.savefig(output_path, bbox_inches='tight')
+        plt.close(fig)
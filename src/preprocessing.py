@@ -0,0 +1,301 @@
+from functools import lru_cache
+import string
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from xmi_reader import find_xmi_files, read_sofa_text
+from instrumentation import StageProfiler, get_profiler, set_profiler
+
+# NLTK takes about a second to import, so it is only loaded once the first pipeline is built
+nltk = None
+stopwords = None
+word_tokenize = None
+WordNetLemmatizer = None
+
+# Function to import NLTK on first use, names that were already set (e.g. offline stand-ins) are kept
+def _load_nltk():
+    global nltk, stopwords, word_tokenize, WordNetLemmatizer
+    if nltk is None:
+        import nltk
+    if stopwords is None:
+        from nltk.corpus import stopwords
+    if word_tokenize is None:
+        from nltk.tokenize import word_tokenize
+    if WordNetLemmatizer is None:
+        from nltk.stem import WordNetLemmatizer
+
+# POS tagging modes: 'exact' tags every token in its sentence context, 'cached' decides once per surface form
+TAGGING_MODES = ('exact', 'cached')
+
+# Default settings of the preprocessing pipeline
+DEFAULT_CONFIG = {
+    'pos_tags_to_keep': ("NOUN", "VERB", "ADJ"),
+    'language': 'german',
+    'lemma_cache_size': 100000,
+    'tagging_mode': 'exact'
+}
+
+# Function to complete a (partial) pipeline configuration with the defaults, without loading any resources
+def resolve_config(**config):
+    resolved = dict(DEFAULT_CONFIG, **config)
+    resolved['pos_tags_to_keep'] = tuple(sorted(resolved['pos_tags_to_keep']))
+    return resolved
+
+# Pipeline holding all resources needed to prepare raw text for topic modeling
+class TextPreprocessor:
+    def __init__(self, pos_tags_to_keep=("NOUN", "VERB", "ADJ"), language='german', lemma_cache_size=100000,
+                 tagging_mode='exact'):
+        if tagging_mode not in TAGGING_MODES:
+            raise ValueError(f"Unknown tagging mode '{tagging_mode}', expected one of {TAGGING_MODES}")
+        _load_nltk()
+
+        # Keep the configuration so callers can tell whether an existing pipeline matches
+        self.config = resolve_config(pos_tags_to_keep=pos_tags_to_keep, language=language,
+                                     lemma_cache_size=lemma_cache_size, tagging_mode=tagging_mode)
+        self.tagging_mode = tagging_mode
+
+        # Build the translation table and regex once instead of for every document
+        self.punctuation_table = str.maketrans("", "", string.punctuation)
+        self.non_letter_pattern = re.compile(r"[^a-zA-Züäöß\s]")
+
+        self.pos_tags_to_keep = set(pos_tags_to_keep)
+        self.stop_words = set(stopwords.words(language))
+        self.lemmatizer = WordNetLemmatizer()
+
+        # Lemmatization of repeated tokens is memoized in a bounded LRU cache
+        self.lemmatize = lru_cache(maxsize=lemma_cache_size)(self.lemmatizer.lemmatize)
+
+        # Kept/dropped decision per surface form, only used in 'cached' tagging mode
+        self.pos_decisions = {}
+        self.pos_cache_hits = 0
+        self.pos_cache_misses = 0
+
+    # Convert text to lowercase and remove punctuation
+    def normalize(self, raw_text):
+        normalized_text = raw_text.lower()
+        normalized_text = normalized_text.translate(self.punctuation_table)
+        return self.non_letter_pattern.sub("", normalized_text)
+
+    # Tokenize the normalized text
+    def tokenize(self, normalized_text):
+        return word_tokenize(normalized_text)
+
+    # Apply POS tagging and retain only nouns, verbs, and adjectives
+    def filter_pos(self, tokens):
+        return self.filter_pos_batch([tokens])[0]
+
+    # Apply POS tagging to the token streams of many documents at once
+    def filter_pos_batch(self, token_lists):
+        if self.tagging_mode == 'cached':
+            return self._filter_pos_cached(token_lists)
+
+        # One tagger call for the whole batch instead of one per document
+        tagged_docs = nltk.pos_tag_sents(token_lists, tagset='universal')
+        return [[word for word, pos in pos_tags if pos in self.pos_tags_to_keep] for pos_tags in tagged_docs]
+
+    # Context-free fast path: tag each unseen surface form once and reuse the decision
+    def _filter_pos_cached(self, token_lists):
+        unseen_words = sorted({word for tokens in token_lists for word in tokens if word not in self.pos_decisions})
+        if unseen_words:
+            tagged_words = nltk.pos_tag_sents([[word] for word in unseen_words], tagset='universal')
+            for [(word, pos)] in tagged_words:
+                self.pos_decisions[word] = pos in self.pos_tags_to_keep
+
+        num_tokens = sum(len(tokens) for tokens in token_lists)
+        self.pos_cache_misses += len(unseen_words)
+        self.pos_cache_hits += num_tokens - len(unseen_words)
+        return [[word for word in tokens if self.pos_decisions[word]] for tokens in token_lists]
+
+    # Remove stopwords
+    def remove_stopwords(self, tokens):
+        return [word for word in tokens if word.lower() not in self.stop_words]
+
+    # Lemmatize the remaining tokens
+    def lemmatize_tokens(self, tokens):
+        return [self.lemmatize(word) for word in tokens]
+
+    # Run the full preprocessing pipeline on one raw text
+    def prepare(self, raw_text):
+        return self.prepare_batch([raw_text])[0]
+
+    # Run the full preprocessing pipeline on a batch of raw texts, tagging them together
+    def prepare_batch(self, raw_texts, doc_names=None):
+        profiler = get_profiler()
+        if not profiler.enabled:
+            token_lists = [self.tokenize(self.normalize(raw_text)) for raw_text in raw_texts]
+            filtered_token_lists = self.filter_pos_batch(token_lists)
+            return [self.lemmatize_tokens(self.remove_stopwords(tokens)) for tokens in filtered_token_lists]
+
+        # Same steps one stage at a time, so each of them can be timed separately
+        with profiler.stage('normalize'):
+            normalized_texts = [self.normalize(raw_text) for raw_text in raw_texts]
+        with profiler.stage('tokenize'):
+            token_lists = [self.tokenize(normalized_text) for normalized_text in normalized_texts]
+        with profiler.stage('pos_tagging'):
+            filtered_token_lists = self.filter_pos_batch(token_lists)
+        with profiler.stage('stopwords'):
+            content_token_lists = [self.remove_stopwords(tokens) for tokens in filtered_token_lists]
+        with profiler.stage('lemmatize'):
+            docs = [self.lemmatize_tokens(tokens) for tokens in content_token_lists]
+
+        doc_names = doc_names or [str(position) for position in range(len(raw_texts))]
+        for name, tokens, filtered_tokens, doc in zip(doc_names, token_lists, filtered_token_lists, docs):
+            profiler.record_document(name, documents=1, tokens_in=len(tokens), tokens_after_pos=len(filtered_tokens),
+                                     tokens_kept=len(doc))
+        return docs
+
+    # Hit/miss counters of the lemma cache
+    def cache_stats(self):
+        info = self.lemmatize.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'maxsize': info.maxsize,
+            'hit_rate': info.hits / lookups if lookups > 0 else 0
+        }
+
+    # Hit/miss counters of the POS decision cache ('cached' tagging mode only)
+    def pos_cache_stats(self):
+        lookups = self.pos_cache_hits + self.pos_cache_misses
+        return {
+            'hits': self.pos_cache_hits,
+            'misses': self.pos_cache_misses,
+            'size': len(self.pos_decisions),
+            'hit_rate': self.pos_cache_hits / lookups if lookups > 0 else 0
+        }
+
+# Preprocessor shared by all calls in this process, built on first use
+_preprocessor = None
+
+# Function to get the preprocessor of this process, creating it once per configuration
+def get_preprocessor(**config):
+    global _preprocessor
+    if _preprocessor is None or _preprocessor.config != resolve_config(**config):
+        _preprocessor = TextPreprocessor(**config)
+    return _preprocessor
+
+# Function to read and preprocess one chunk of .xmi files with the preprocessor of this process
+def preprocess_files_batch(file_paths, config):
+    preprocessor = get_preprocessor(**config)
+    raw_texts = []
+    for file_path in file_paths:
+        print(f"Processing file: {file_path}")
+        with get_profiler().stage('xml_parse'):
+            raw_texts.append(read_sofa_text(file_path))
+    return preprocessor.prepare_batch(raw_texts, doc_names=file_paths)
+
+# Function to count the lemma cache hits and misses of a preprocessor since an earlier cache_stats() call
+def cache_counts_since(preprocessor, earlier_stats):
+    stats = preprocessor.cache_stats()
+    return {'hits': stats['hits'] - earlier_stats['hits'], 'misses': stats['misses'] - earlier_stats['misses']}
+
+# Function to print how often lemmatization was served from the cache
+def print_cache_counts(cache_counts):
+    lookups = cache_counts['hits'] + cache_counts['misses']
+    hit_rate = cache_counts['hits'] / lookups if lookups > 0 else 0
+    print(f"Lemma cache: {cache_counts['hits']} hits, {cache_counts['misses']} misses ({hit_rate:.1%} hit rate)")
+
+# Function to preprocess one chunk in a pool worker, returning the lemma cache counts of the chunk and, when
+# profiling, the stage data collected for it
+def _preprocess_files_batch_in_worker(file_paths, config):
+    preprocessor = get_preprocessor(**config)
+    earlier_stats = preprocessor.cache_stats()
+    docs = preprocess_files_batch(file_paths, config)
+    profiler = get_profiler()
+    snapshot = profiler.pop_snapshot() if profiler.enabled else None
+    return docs, cache_counts_since(preprocessor, earlier_stats), snapshot
+
+# Function to set up a pool worker, loading the NLTK resources once per worker
+def _init_worker(config, profiler_options=None):
+    if profiler_options is not None:
+        set_profiler(StageProfiler(**profiler_options))
+    get_preprocessor(**config)
+
+# Function to preprocess .xmi files serially or on a process pool, yielding documents in the order of file_paths
+def iter_preprocess_files(file_paths, workers=1, batch_size=64, **config):
+    batches = [file_paths[i:i + batch_size] for i in range(0, len(file_paths), batch_size)]
+    if not batches:
+        return
+
+    # Report how often lemmatization was served from the cache during this call
+    if workers is not None and workers <= 1:
+        preprocessor = get_preprocessor(**config)
+        earlier_stats = preprocessor.cache_stats()
+        for batch in batches:
+            yield from preprocess_files_batch(batch, config)
+        print_cache_counts(cache_counts_since(preprocessor, earlier_stats))
+        return
+
+    # executor.map yields the chunks in submission order, so documents keep the serial order
+    # Pool workers keep their own lemma caches and profilers and hand their counts back with every chunk
+    profiler = get_profiler()
+    profiler_options = profiler.options() if profiler.enabled else None
+    cache_counts = {'hits': 0, 'misses': 0}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(config, profiler_options)) as executor:
+        for batch_docs, batch_cache_counts, snapshot in executor.map(_preprocess_files_batch_in_worker, batches,
+                                                                     [config] * len(batches)):
+            if snapshot is not None:
+                profiler.merge(snapshot)
+            cache_counts['hits'] += batch_cache_counts['hits']
+            cache_counts['misses'] += batch_cache_counts['misses']
+            yield from batch_docs
+    print_cache_counts(cache_counts)
+
+# Function to preprocess .xmi files serially or on a process pool, keeping the order of file_paths
+def preprocess_files(file_paths, workers=1, batch_size=64, **config):
+    return list(iter_preprocess_files(file_paths, workers=workers, batch_size=batch_size, **config))
+
+# Function to compare per-document, batched and cached POS tagging on a sample of .xmi files
+def compare_tagging_modes(folder_path, sample_size=200):
+    file_paths = find_xmi_files(folder_path)[:sample_size]
+    if len(file_paths) == 0:
+        print("No .xmi files found.")
+        return {}
+
+    preprocessor = TextPreprocessor()
+    token_lists = [preprocessor.tokenize(preprocessor.normalize(read_sofa_text(path))) for path in file_paths]
+    keep = preprocessor.pos_tags_to_keep
+
+    # Original approach: one tagger call per document
+    start = time.perf_counter()
+    per_doc_tagged = [nltk.pos_tag(tokens, tagset='universal') for tokens in token_lists]
+    per_doc_seconds = time.perf_counter() - start
+    per_doc_mask = [pos in keep for pos_tags in per_doc_tagged for word, pos in pos_tags]
+
+    # Batched exact tagging through pos_tag_sents
+    start = time.perf_counter()
+    batched_filtered = preprocessor.filter_pos_batch(token_lists)
+    batched_seconds = time.perf_counter() - start
+
+    # Context-free cached decisions, starting from a cold cache
+    cached_preprocessor = TextPreprocessor(tagging_mode='cached')
+    start = time.perf_counter()
+    cached_filtered = cached_preprocessor.filter_pos_batch(token_lists)
+    cached_seconds = time.perf_counter() - start
+    cached_mask = [cached_preprocessor.pos_decisions[word] for tokens in token_lists for word in tokens]
+
+    # Agreement of the kept/dropped decision per token with the per-document tagging
+    per_doc_filtered = [[word for word, pos in pos_tags if pos in keep] for pos_tags in per_doc_tagged]
+    matching = sum(1 for exact, cached in zip(per_doc_mask, cached_mask) if exact == cached)
+    comparison = {
+        'documents': len(token_lists),
+        'tokens': len(per_doc_mask),
+        'per_document_seconds': per_doc_seconds,
+        'batched_seconds': batched_seconds,
+        'cached_seconds': cached_seconds,
+        'batched_speedup': per_doc_seconds / batched_seconds if batched_seconds > 0 else 0,
+        'cached_speedup': per_doc_seconds / cached_seconds if cached_seconds > 0 else 0,
+        'batched_identical': batched_filtered == per_doc_filtered,
+        'cached_agreement': matching / len(per_doc_mask) if per_doc_mask else 1.0,
+        'cached_identical_documents': sum(1 for a, b in zip(per_doc_filtered, cached_filtered) if a == b)
+    }
+
+    print(f"Per-document tagging: {per_doc_seconds:.2f}s")
+    print(f"Batched tagging: {batched_seconds:.2f}s ({comparison['batched_speedup']:.1f}x), "
+          f"identical output: {comparison['batched_identical']}")
+    print(f"Cached tagging: {cached_seconds:.2f}s ({comparison['cached_speedup']:.1f}x), "
+          f"token agreement: {comparison['cached_agreement']:.2%}")
+    return comparison
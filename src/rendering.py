@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import matplotlib
+matplotlib.use('Agg')    # Render without a display, figures are only written to files
+from concurrent.futures import ProcessPoolExecutor
+from wordcloud import WordCloud
+from analyze_data import visualize_wordcloud
+from compare_results import (plot_histograms, plot_mean_std_graph, plot_normal_distribution_interactive,
+                             display_intersection_ratios_table)
+from comparison_index import period_label, sync_index, load_index
+from metrics import find_results_files
+from plotting import WORDCLOUD_OPTIONS
+from results_store import TOPICS_FILE, load_results
+
+RENDER_MANIFEST = 'render_manifest.json'
+RENDER_SOURCES = 'render_sources.json'
+
+# WordCloud instance of this worker, configured once and reused for every topic
+_wordcloud = None
+
+# Function to set up a render worker
+def _init_render_worker():
+    global _wordcloud
+    matplotlib.use('Agg')
+    _wordcloud = WordCloud(**WORDCLOUD_OPTIONS)
+
+# Function to render one figure job to its output file, runs inside a render worker
+def render_job(job):
+    kind, data, output_path = job['kind'], job['data'], job['output_path']
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    if kind == 'wordcloud':
+        visualize_wordcloud(data['words'], data['topic_id'], output_path, wordcloud=_wordcloud)
+    elif kind == 'histogram':
+        plot_histograms(data['jaccard_data'], data['labels'], output_path=output_path)
+    elif kind == 'mean_std':
+        plot_mean_std_graph(data['means'], data['std_devs'], data['labels'], output_path=output_path)
+    elif kind == 'normal_distribution':
+        plot_normal_distribution_interactive(data['jaccard_data'], data['labels'], output_path=output_path)
+    elif kind == 'intersection_table':
+        display_intersection_ratios_table(data['ratios'], data['labels'], output_path=output_path)
+    else:
+        raise ValueError(f"Unknown figure kind '{kind}'")
+    return output_path
+
+# Function to hash the input data of a figure, unchanged hashes mean the figure can be skipped
+def job_hash(job):
+    encoded = json.dumps([job['kind'], job['data'], WORDCLOUD_OPTIONS], sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+# Function to describe the state of a results file, its top words are only loaded again once it changed
+def source_key(results_file):
+    stat_path = os.path.join(results_file, TOPICS_FILE) if os.path.isdir(results_file) else results_file
+    stat = os.stat(stat_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+# Function to get the top words per topic of every results file, from the sources cache for unchanged files
+# (sources maps a results file to its source key and top words and is updated in place)
+def load_top_words(results_files, sources):
+    top_words = {}
+    for results_file in results_files:
+        key = source_key(results_file)
+        cached = sources.get(results_file)
+        if cached is None or cached['key'] != key:
+            top_words_per_topic = load_results(results_file)['top_words_per_topic']
+            # JSON object keys are strings, so the topics are kept as [topic_id, words] pairs
+            cached = sources[results_file] = {
+                'key': key,
+                'topics': [[topic_id, list(words)] for topic_id, words in top_words_per_topic.items()]
+            }
+        top_words[results_file] = {topic_id: words for topic_id, words in cached['topics']}
+    return top_words
+
+# Function to write a JSON file of the renderer atomically
+def save_json(data, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+# Function to build the word cloud jobs of every topic of every results file
+def wordcloud_jobs(results_files, output_dir, formats, sources=None):
+    top_words = load_top_words(results_files, {} if sources is None else sources)
+    jobs = []
+    for results_file in results_files:
+        time_span = period_label(results_file)
+        for topic_id, words in top_words[results_file].items():
+            for fmt in formats:
+                jobs.append({
+                    'kind': 'wordcloud',
+                    'data': {'words': list(words), 'topic_id': topic_id},
+                    'output_path': os.path.join(output_dir, time_span, f'wordcloud_topic_{topic_id}.{fmt}')
+                })
+    return jobs
+
+# Function to build the jobs of the cross-period comparison plots
+def comparison_jobs(comparison_folder, output_dir, formats):
+    sync_index(comparison_folder)
+    index = load_index(comparison_folder)
+    if len(index['labels']) == 0:
+        return []
+
+    labels = index['labels']
+    jaccard_data_list = [data.tolist() for data in index['jaccard_similarities']]
+    intersection_ratios = index['topic_intersection_ratios']
+    figures = {
+        'histogram': {'jaccard_data': jaccard_data_list, 'labels': labels},
+        'mean_std': {'means': index['means'], 'std_devs': index['std_devs'], 'labels': labels},
+        'normal_distribution': {'jaccard_data': jaccard_data_list, 'labels': labels},
+        'intersection_table': {'ratios': [float(ratio) for ratio in intersection_ratios], 'labels': labels}
+    }
+    return [{'kind': kind, 'data': data, 'output_path': os.path.join(output_dir, 'comparison', f'{kind}.{fmt}')}
+            for kind, data in figures.items() for fmt in formats]
+
+# Function to render all figures headlessly on a process pool, skipping figures whose input did not change
+def render_all(results_folder='Results', comparison_folder='Comparison Results', output_dir='Figures',
+               formats=('png',), workers=None, force=False):
+    # Results files are only loaded when they changed since the last run, otherwise their top words are cached
+    sources_path = os.path.join(output_dir, RENDER_SOURCES)
+    sources = {}
+    if os.path.exists(sources_path) and not force:
+        with open(sources_path, encoding='utf-8') as f:
+            sources = json.load(f)
+    results_files = find_results_files(results_folder)
+    jobs = wordcloud_jobs(results_files, output_dir, formats, sources)
+    save_json({path: sources[path] for path in results_files}, sources_path)
+    if os.path.isdir(comparison_folder):
+        jobs += comparison_jobs(comparison_folder, output_dir, formats)
+
+    manifest_path = os.path.join(output_dir, RENDER_MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    pending = []
+    for job in jobs:
+        job['hash'] = job_hash(job)
+        if not force and manifest.get(job['output_path']) == job['hash'] and os.path.exists(job['output_path']):
+            continue
+        pending.append(job)
+    print(f"Rendering {len(pending)} of {len(jobs)} figures ({len(jobs) - len(pending)} unchanged)")
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker) as executor:
+            for job, output_path in zip(pending, executor.map(render_job, pending)):
+                manifest[output_path] = job['hash']
+
+        save_json(manifest, manifest_path)
+    return [job['output_path'] for job in jobs]
+
+# Command line entry point, e.g. python rendering.py --format png svg
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render word clouds and comparison plots to files.")
+    parser.add_argument('--results-folder', default='Results')
+    parser.add_argument('--comparison-folder', default='Comparison Results')
+    parser.add_argument('--output-dir', default='Figures')
+    parser.add_argument('--format', nargs='+', default=['png'], choices=['png', 'svg', 'pdf'])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help="Render all figures even if their input is unchanged")
+    args = parser.parse_args(argv)
+    render_all(args.results_folder, args.comparison_folder, args.output_dir, args.format, args.workers, args.force)
+    return 0
+
+## Main execution point
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import os
+import json
+import pickle
+import shutil
+import numpy as np
+
+# File names of the sections inside a results store directory
+TOKENS_IDS_FILE = 'token_ids.npy'
+TOKENS_OFFSETS_FILE = 'token_offsets.npy'
+VOCABULARY_FILE = 'vocabulary.json'
+TOPICS_FILE = 'top_words_per_topic.json'
+COMPARISON_FILE = 'comparison_results.parquet'
+TRAINING_STATS_FILE = 'training_stats.json'
+SOURCE_FILES_FILE = 'source_files.json'
+LEMMA_COUNTS_FILE = 'lemma_counts.json'
+MODEL_FILE = os.path.join('lda_model', 'lda_model.gensim')
+
+# Function to write the preprocessed documents as one flat integer array with document offsets and a vocabulary
+def _save_tokens(prep_docs, directory):
+    vocabulary = []
+    token2id = {}
+    token_ids = []
+    offsets = [0]
+    for doc in prep_docs:
+        for token in doc:
+            token_id = token2id.get(token)
+            if token_id is None:
+                token_id = token2id[token] = len(vocabulary)
+                vocabulary.append(token)
+            token_ids.append(token_id)
+        offsets.append(len(token_ids))
+
+    np.save(os.path.join(directory, TOKENS_IDS_FILE), np.asarray(token_ids, dtype=np.int32))
+    np.save(os.path.join(directory, TOKENS_OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+    with open(os.path.join(directory, VOCABULARY_FILE), 'w', encoding='utf-8') as f:
+        json.dump(vocabulary, f, ensure_ascii=False)
+
+# Function to write the per-document comparison results as a columnar Parquet table
+def _save_comparison(comparison_results, directory):
+    # pyarrow is only imported when a store is written or its comparison table read
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pa.table({
+        'document': pa.array([result['document'] for result in comparison_results], type=pa.int64()),
+        'dominant_topics': pa.array([result['dominant_topics'] for result in comparison_results], type=pa.list_(pa.int64())),
+        'most_frequent_lemmas': pa.array([[lemma for lemma, count in result['most_frequent_lemmas']]
+                                          for result in comparison_results], type=pa.list_(pa.string())),
+        'most_frequent_counts': pa.array([[count for lemma, count in result['most_frequent_lemmas']]
+                                          for result in comparison_results], type=pa.list_(pa.int64())),
+        'common_words': pa.array([result['common_words'] for result in comparison_results], type=pa.list_(pa.string()))
+    })
+    pq.write_table(table, os.path.join(directory, COMPARISON_FILE))
+
+# Optional sections stored as plain JSON files
+OPTIONAL_JSON_SECTIONS = {
+    'training_stats': TRAINING_STATS_FILE,
+    'source_files': SOURCE_FILES_FILE,
+    'lemma_counts': LEMMA_COUNTS_FILE
+}
+
+# Function to save a results dict as a results store directory, replacing an existing one atomically
+def save_results_store(results, directory):
+    temp_directory = directory.rstrip(os.sep) + '.tmp'
+    if os.path.exists(temp_directory):
+        shutil.rmtree(temp_directory)
+    os.makedirs(os.path.join(temp_directory, os.path.dirname(MODEL_FILE)))
+
+    _save_tokens(results['prep_docs'], temp_directory)
+    _save_comparison(results['comparison_results'], temp_directory)
+    with open(os.path.join(temp_directory, TOPICS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(results['top_words_per_topic'], f, ensure_ascii=False)
+    # Sections added in later versions of the results dict are only written when present
+    for key, filename in OPTIONAL_JSON_SECTIONS.items():
+        if key in results:
+            with open(os.path.join(temp_directory, filename), 'w', encoding='utf-8') as f:
+                json.dump(results[key], f, ensure_ascii=False)
+
+    # gensim stores the large arrays as separate .npy files so they can be memory-mapped on load
+    results['lda_model'].save(os.path.join(temp_directory, MODEL_FILE), sep_limit=0)
+
+    # Swap the new directory in, the old one is only removed once the new one is in place
+    old_directory = directory.rstrip(os.sep) + '.old'
+    if os.path.exists(directory):
+        os.replace(directory, old_directory)
+    os.replace(temp_directory, directory)
+    if os.path.exists(old_directory):
+        shutil.rmtree(old_directory)
+
+# Lazily loaded results, each section is only read from disk when it is first accessed
+class ResultsStore:
+    SECTIONS = ('prep_docs', 'top_words_per_topic', 'dominant_topics_per_doc', 'comparison_results',
+                'lda_model', 'training_stats', 'source_files', 'lemma_counts')
+
+    def __init__(self, directory):
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f"No results store at {directory}")
+        self.directory = directory
+        self._loaded = {}
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    # Dict-style access so a store can be used wherever a results dict is expected
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if key not in self._loaded:
+            if key in OPTIONAL_JSON_SECTIONS:
+                self._loaded[key] = self._load_json(OPTIONAL_JSON_SECTIONS[key])
+            else:
+                self._loaded[key] = getattr(self, '_load_' + key)()
+        return self._loaded[key]
+
+    def __contains__(self, key):
+        if key in OPTIONAL_JSON_SECTIONS:
+            return os.path.exists(self._path(OPTIONAL_JSON_SECTIONS[key]))
+        return key in self.SECTIONS
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def keys(self):
+        return [key for key in self.SECTIONS if key in self]
+
+    # Function to read selected columns of the comparison table without building Python objects
+    def comparison_table(self, columns=None):
+        import pyarrow.parquet as pq
+        return pq.read_table(self._path(COMPARISON_FILE), columns=columns)
+
+    # Function to read the token arrays, memory-mapped, together with the vocabulary
+    def token_arrays(self):
+        token_ids = np.load(self._path(TOKENS_IDS_FILE), mmap_mode='r')
+        offsets = np.load(self._path(TOKENS_OFFSETS_FILE), mmap_mode='r')
+        with open(self._path(VOCABULARY_FILE), encoding='utf-8') as f:
+            vocabulary = json.load(f)
+        return token_ids, offsets, vocabulary
+
+    def _load_prep_docs(self):
+        token_ids, offsets, vocabulary = self.token_arrays()
+        return [[vocabulary[token_id] for token_id in token_ids[start:end]]
+                for start, end in zip(offsets[:-1], offsets[1:])]
+
+    def _load_top_words_per_topic(self):
+        with open(self._path(TOPICS_FILE), encoding='utf-8') as f:
+            return {int(topic_id): words for topic_id, words in json.load(f).items()}
+
+    def _load_dominant_topics_per_doc(self):
+        return self.comparison_table(['dominant_topics']).column('dominant_topics').to_pylist()
+
+    def _load_comparison_results(self):
+        columns = self.comparison_table().to_pydict()
+        return [{
+            'document': document,
+            'dominant_topics': dominant_topics,
+            'most_frequent_lemmas': list(zip(lemmas, counts)),
+            'common_words': common_words
+        } for document, dominant_topics, lemmas, counts, common_words in zip(
+            columns['document'], columns['dominant_topics'], columns['most_frequent_lemmas'],
+            columns['most_frequent_counts'], columns['common_words'])]
+
+    def _load_lda_model(self):
+        # gensim is only imported when the model is actually needed
+        from gensim import models
+        return models.LdaModel.load(self._path(MODEL_FILE), mmap='r')
+
+    def _load_json(self, filename):
+        with open(self._path(filename), encoding='utf-8') as f:
+            return json.load(f)
+
+# Function to load results from a results store directory or an existing pickle file
+def load_results(path):
+    if os.path.isdir(path):
+        return ResultsStore(path)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+# Function to convert an existing results pickle file into a results store directory
+def convert_pickle(pickle_path, directory=None):
+    if directory is None:
+        directory = os.path.splitext(pickle_path)[0]
+    with open(pickle_path, 'rb') as f:
+        results = pickle.load(f)
+    save_results_store(results, directory)
+    return directory
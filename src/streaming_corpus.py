@@ -0,0 +1,50 @@
+import os
+from gensim import corpora
+
+# Preprocessed documents stored on disk, one document per line with space-separated tokens
+# Results of a streaming run pickle this object instead of the tokens, they need the token file to stay in place
+class TokenFileCorpus:
+    def __init__(self, path, num_docs=None):
+        # Absolute, so pickled results still find the file when loaded from another working directory
+        self.path = os.path.abspath(path)
+        self.num_docs = num_docs
+
+    # Stream the documents back from disk, one token list at a time
+    def __iter__(self):
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                yield line.split()
+
+    def __len__(self):
+        if self.num_docs is None:
+            with open(self.path, encoding='utf-8') as f:
+                self.num_docs = sum(1 for _ in f)
+        return self.num_docs
+
+# Function to write documents to a token file while building the dictionary in the same pass
+def write_token_file(docs, path):
+    dictionary = corpora.Dictionary()
+    num_docs = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for doc in docs:
+            f.write(' '.join(doc) + '\n')
+            num_docs += 1
+
+            # Count the document right away (what add_documents does per document), so only one
+            # token list is held at a time
+            dictionary.doc2bow(doc, allow_update=True)
+
+    return TokenFileCorpus(path, num_docs), dictionary
+
+# Function to serialize preprocessed documents to disk and build a memory-mapped BoW corpus from them
+def build_streaming_corpus(docs, stream_dir, no_below=1, no_above=0.5):
+    os.makedirs(stream_dir, exist_ok=True)
+    token_corpus, dictionary = write_token_file(docs, os.path.join(stream_dir, 'tokens.txt'))
+    dictionary.filter_extremes(no_below=no_below, no_above=no_above)
+
+    # Serialize the BoW vectors once, LDA passes then read them back from the Matrix Market file
+    corpus_path = os.path.join(stream_dir, 'corpus.mm')
+    corpora.MmCorpus.serialize(corpus_path, (dictionary.doc2bow(doc) for doc in token_corpus))
+    dictionary.save(os.path.join(stream_dir, 'dictionary.gensim'))
+
+    return token_corpus, dictionary, corpora.MmCorpus(corpus_path)
@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import math
+import hashlib
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from gensim import corpora, models
+from gensim.models import CoherenceModel
+from xmi_reader import find_xmi_files
+from preprocessing import TAGGING_MODES, iter_preprocess_files
+from token_cache import TokenCache, shard_name, config_fingerprint
+from streaming_corpus import TokenFileCorpus, build_streaming_corpus
+from lda_training import compute_perplexity, continue_training
+
+# Candidate values swept by default, every combination is one candidate configuration
+SWEEP_GRID = {
+    'num_topics': (5, 10, 15, 20, 25, 30),
+    'eta': (0.05, 0.15, 0.5)
+}
+
+# Number of passes after which the candidates are scored, the last checkpoint is the full training length
+CHECKPOINTS = (5, 10, 20)
+
+# Share of the candidates kept at every checkpoint before the last one
+KEEP_FRACTION = 0.5
+
+# Metrics used for pruning and whether higher values are better
+PRUNE_METRICS = {'u_mass': True, 'perplexity': False}
+
+TOKENS_FILE = 'tokens.txt'
+CORPUS_FILE = 'corpus.mm'
+DICTIONARY_FILE = 'dictionary.gensim'
+REPORT_FILE = 'sweep_report.json'
+FINGERPRINT_FILE = 'corpus_fingerprint.txt'
+
+# Function to list every candidate configuration of a grid
+def candidate_configs(grid=None):
+    grid = grid or SWEEP_GRID
+    keys = sorted(grid)
+    candidates = []
+    for values in itertools.product(*(grid[key] for key in keys)):
+        config = dict(zip(keys, values))
+        config['name'] = '_'.join(f"{key}={value}" for key, value in config.items())
+        candidates.append(config)
+    return candidates
+
+# Function to fingerprint the input of a sweep corpus, the .xmi files (names, sizes, modification times)
+# and the preprocessing configuration
+def corpus_fingerprint(file_paths, tagging_mode='exact'):
+    digest = hashlib.sha256()
+    for file_path in sorted(file_paths):
+        stat = os.stat(file_path)
+        digest.update(f"{file_path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode('utf-8'))
+    digest.update(config_fingerprint(tagging_mode=tagging_mode).encode('utf-8'))
+    return digest.hexdigest()
+
+# Function to preprocess a folder once into the shared corpus of a sweep, a corpus built from the same files
+# and configuration is reused
+def prepare_sweep_corpus(folder_path, sweep_dir, tagging_mode='exact', batch_size=64, workers=1, cache_dir=None):
+    file_paths = find_xmi_files(folder_path)
+    fingerprint = corpus_fingerprint(file_paths, tagging_mode)
+    fingerprint_path = os.path.join(sweep_dir, FINGERPRINT_FILE)
+    if os.path.exists(fingerprint_path):
+        with open(fingerprint_path, encoding='utf-8') as f:
+            if f.read().strip() == fingerprint and all(os.path.exists(os.path.join(sweep_dir, name))
+                                                       for name in (TOKENS_FILE, CORPUS_FILE, DICTIONARY_FILE)):
+                print(f"Reusing sweep corpus in {sweep_dir}")
+                return
+        # The fingerprint goes first, an interrupted rebuild must not look like a valid corpus
+        os.remove(fingerprint_path)
+
+    if cache_dir is None:
+        docs = iter_preprocess_files(file_paths, workers=workers, batch_size=batch_size, tagging_mode=tagging_mode)
+    else:
+        token_cache = TokenCache(cache_dir, tagging_mode=tagging_mode)
+        docs = token_cache.preprocess_files(file_paths, shard_name(folder_path), workers=workers, batch_size=batch_size)
+
+    # Same dictionary filtering as process_documents, written to disk once for all sweep workers
+    build_streaming_corpus(docs, sweep_dir)
+    with open(fingerprint_path, 'w', encoding='utf-8') as f:
+        f.write(fingerprint)
+
+# Shared corpus of this sweep worker, loaded once and reused for every candidate it trains
+_sweep_data = None
+
+# Function to set up a sweep worker with the dictionary, BoW and TF-IDF corpus and the token lists
+def _init_sweep_worker(sweep_dir):
+    global _sweep_data
+    dictionary = corpora.Dictionary.load(os.path.join(sweep_dir, DICTIONARY_FILE))
+    corpus = list(corpora.MmCorpus(os.path.join(sweep_dir, CORPUS_FILE)))
+    # The dictionary document frequencies give the same IDF weights as TfidfModel(corpus) in process_documents
+    tfidf = models.TfidfModel(dictionary=dictionary)
+    _sweep_data = {
+        'dictionary': dictionary,
+        'corpus': corpus,
+        'corpus_tfidf': list(tfidf[corpus]),
+        'texts': list(TokenFileCorpus(os.path.join(sweep_dir, TOKENS_FILE)))
+    }
+
+# Function to train a candidate up to the given number of passes and score it, runs inside a sweep worker
+def train_candidate(task):
+    config, model_path = task['config'], task['model_path']
+    dictionary, corpus_tfidf = _sweep_data['dictionary'], _sweep_data['corpus_tfidf']
+
+    start = time.perf_counter()
+    if task['passes_done'] == 0:
+        lda_model = models.LdaModel(corpus_tfidf, num_topics=config['num_topics'], id2word=dictionary,
+                                    passes=task['passes'], eta=config['eta'], random_state=task['random_state'])
+    else:
+        # Continue the partially trained model of the previous checkpoint instead of starting over, as extra passes
+        # over the same documents
+        lda_model = models.LdaModel.load(model_path)
+        continue_training(lda_model, corpus_tfidf, passes=task['passes'] - task['passes_done'],
+                          passes_done=task['passes_done'])
+    lda_model.save(model_path)
+    seconds = time.perf_counter() - start
+
+    scores = dict(config)
+    scores['passes'] = task['passes']
+    scores['seconds'] = task['seconds'] + seconds
+    scores['perplexity'] = compute_perplexity(lda_model, corpus_tfidf)
+    scores['u_mass'] = CoherenceModel(model=lda_model, corpus=_sweep_data['corpus'], dictionary=dictionary,
+                                      coherence='u_mass').get_coherence()
+    # c_v needs sliding windows over the token lists, it is only computed for candidates that reach the end
+    if task['final']:
+        scores['c_v'] = CoherenceModel(model=lda_model, texts=_sweep_data['texts'], dictionary=dictionary,
+                                       coherence='c_v', processes=1).get_coherence()
+    scores['model_path'] = model_path
+    return scores
+
+# Function to sort the candidate scores into the report order: finished candidates by c_v, then pruned ones by how far they got
+def rank_candidates(finished, pruned, prune_metric='u_mass'):
+    sign = -1 if PRUNE_METRICS[prune_metric] else 1
+    ranked = sorted(finished, key=lambda scores: (-scores['c_v'], -scores['u_mass']))
+    ranked += sorted(pruned, key=lambda scores: (-scores['passes'], sign * scores[prune_metric]))
+    for rank, scores in enumerate(ranked, start=1):
+        scores['rank'] = rank
+    return ranked
+
+# Function to print the ranked report as a table
+def print_report(ranked):
+    print(f"{'rank':>4}  {'num_topics':>10}  {'eta':>6}  {'passes':>6}  {'c_v':>7}  {'u_mass':>8}  {'perplexity':>10}  {'seconds':>7}")
+    for scores in ranked:
+        c_v = f"{scores['c_v']:.4f}" if 'c_v' in scores else 'pruned'
+        print(f"{scores['rank']:>4}  {scores['num_topics']:>10}  {scores['eta']:>6}  {scores['passes']:>6}  {c_v:>7}  "
+              f"{scores['u_mass']:>8.4f}  {scores['perplexity']:>10.1f}  {scores['seconds']:>7.1f}")
+
+# Function to sweep LDA configurations concurrently on one shared corpus, pruning the weaker half at every checkpoint
+def run_sweep(folder_path, sweep_dir, grid=None, checkpoints=CHECKPOINTS, keep_fraction=KEEP_FRACTION, workers=None,
+              prune_metric='u_mass', random_state=0, tagging_mode='exact', batch_size=64, cache_dir=None):
+    if prune_metric not in PRUNE_METRICS:
+        raise ValueError(f"Unknown prune metric '{prune_metric}', expected one of {tuple(PRUNE_METRICS)}")
+    checkpoints = sorted(checkpoints)
+
+    os.makedirs(os.path.join(sweep_dir, 'models'), exist_ok=True)
+    prepare_sweep_corpus(folder_path, sweep_dir, tagging_mode=tagging_mode, batch_size=batch_size,
+                         workers=workers or os.cpu_count(), cache_dir=cache_dir)
+
+    active = [{'config': config, 'passes_done': 0, 'seconds': 0.0} for config in candidate_configs(grid)]
+    pruned = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep_worker, initargs=(sweep_dir,)) as executor:
+        for checkpoint_index, passes in enumerate(checkpoints):
+            final = checkpoint_index == len(checkpoints) - 1
+            tasks = [{
+                'config': candidate['config'],
+                'passes_done': candidate['passes_done'],
+                'passes': passes,
+                'seconds': candidate['seconds'],
+                'final': final,
+                'random_state': random_state,
+                'model_path': os.path.join(sweep_dir, 'models', candidate['config']['name'] + '.gensim')
+            } for candidate in active]
+            results = list(executor.map(train_candidate, tasks))
+            if final:
+                break
+
+            # Keep the best share of the candidates by the partial-pass scores
+            results.sort(key=lambda scores: scores[prune_metric], reverse=PRUNE_METRICS[prune_metric])
+            num_kept = max(1, math.ceil(len(results) * keep_fraction))
+            pruned += results[num_kept:]
+            print(f"Checkpoint {passes} passes: kept {num_kept} of {len(results)} candidates")
+            active = [{'config': {key: scores[key] for key in ('name', 'num_topics', 'eta')},
+                       'passes_done': passes, 'seconds': scores['seconds']} for scores in results[:num_kept]]
+
+    ranked = rank_candidates(results, pruned, prune_metric)
+    print_report(ranked)
+
+    report_path = os.path.join(sweep_dir, REPORT_FILE)
+    temp_path = report_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'folder': folder_path, 'prune_metric': prune_metric, 'checkpoints': checkpoints,
+                   'candidates': ranked}, f, indent=2)
+    os.replace(temp_path, report_path)
+    return ranked
+
+# Command line entry point, e.g. python sweep.py path/2021-2025 --sweep-dir sweeps/2021-2025 --workers 8
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Sweep LDA topic counts and priors on one time span.",
+        epilog="The folder is preprocessed once into a shared corpus in --sweep-dir, rebuilt when the files or the "
+               "tagging mode change. Candidates are trained concurrently and scored with perplexity and u_mass "
+               "coherence at every checkpoint, only the best --keep-fraction continues. Finished candidates are "
+               "ranked by c_v coherence and written to sweep_report.json. Pass the winner to lda_topic_modelling.py "
+               "with --num-topics, --eta and --passes.")
+    parser.add_argument('folder_path', help="Folder of the time span with the .xmi files")
+    parser.add_argument('--sweep-dir', required=True, help="Directory for the shared corpus, candidate models and report")
+    parser.add_argument('--num-topics', type=int, nargs='+', default=list(SWEEP_GRID['num_topics']))
+    parser.add_argument('--eta', type=float, nargs='+', default=list(SWEEP_GRID['eta']))
+    parser.add_argument('--checkpoints', type=int, nargs='+', default=list(CHECKPOINTS),
+                        help="Passes after which candidates are scored and pruned, the last one is the full length")
+    parser.add_argument('--keep-fraction', type=float, default=KEEP_FRACTION)
+    parser.add_argument('--prune-metric', choices=tuple(PRUNE_METRICS), default='u_mass')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--tagging-mode', choices=TAGGING_MODES, default='exact')
+    parser.add_argument('--cache-dir', default=None, help="Directory of the preprocessed token cache")
+    args = parser.parse_args(argv)
+    ranked = run_sweep(args.folder_path, args.sweep_dir, grid={'num_topics': args.num_topics, 'eta': args.eta},
+                       checkpoints=args.checkpoints, keep_fraction=args.keep_fraction, workers=args.workers,
+                       prune_metric=args.prune_metric, tagging_mode=args.tagging_mode, cache_dir=args.cache_dir)
+    best = ranked[0]
+    print(f"Best: --num-topics {best['num_topics']} --eta {best['eta']} --passes {best['passes']}")
+    return 0
+
+## Main execution point
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import os
+import sys
+import random
+import argparse
+from xml.sax.saxutils import quoteattr
+
+# Building blocks of German-looking words, combined into a fixed vocabulary per seed
+PREFIXES = ('', '', '', 'ver', 'be', 'ge', 'ent', 'er', 'un', 'vor', 'aus', 'ein', 'auf', 'an', 'bundes', 'landes')
+STEMS = ('arbeit', 'recht', 'land', 'rat', 'gesetz', 'haus', 'wirt', 'steuer', 'bild', 'schutz', 'sicher', 'kraft',
+         'wahl', 'frage', 'plan', 'handel', 'verkehr', 'umwelt', 'energie', 'familie', 'schul', 'kranken', 'gericht',
+         'polizei', 'rente', 'stadt', 'dorf', 'markt', 'preis', 'lohn', 'bahn', 'wasser', 'wald', 'grenz', 'zoll')
+NOUN_SUFFIXES = ('ung', 'heit', 'keit', 'schaft', 'tion', 'nis', 'er', 'e', 'en', '')
+ADJECTIVE_SUFFIXES = ('lich', 'ig', 'isch', 'bar', 'sam')
+VERB_SUFFIXES = ('en', 'ieren', 'eln', 'ern')
+
+# Frequent function words, they make up a large share of running parliamentary text
+FUNCTION_WORDS = ('der', 'die', 'das', 'und', 'in', 'zu', 'den', 'nicht', 'von', 'sie', 'ist', 'des', 'sich', 'mit',
+                  'dem', 'dass', 'er', 'es', 'ein', 'ich', 'auf', 'so', 'eine', 'auch', 'als', 'an', 'nach', 'wie',
+                  'im', 'für', 'man', 'aber', 'aus', 'durch', 'wenn', 'nur', 'war', 'noch', 'werden', 'bei', 'hat',
+                  'wir', 'was', 'wird', 'sein', 'einen', 'welche', 'sind', 'oder', 'zur', 'um', 'haben', 'einer',
+                  'mir', 'über', 'ihm', 'diese', 'einem', 'ihr', 'uns', 'da', 'zum', 'kann', 'doch', 'vor', 'dieser')
+
+# Agenda-style boilerplate that GerParCor protocols repeat in every session
+BOILERPLATE = ('Präsident', 'Bundesrat', 'Sitzung', 'Tagesordnung', 'Punkt', 'Drucksache', 'Ausschuss', 'Beschluss',
+               'Abstimmung', 'Wort', 'Damen', 'Herren', 'Beifall')
+
+# Share of function words in the generated running text
+FUNCTION_WORD_SHARE = 0.45
+
+XMI_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<xmi:XMI xmlns:xmi="http://www.omg.org/XMI" xmlns:cas="http:///uima/cas.ecore" '
+              'xmlns:type4="http:///de/tudarmstadt/ukp/dkpro/core/api/segmentation/type.ecore" '
+              'xmlns:pos="http:///de/tudarmstadt/ukp/dkpro/core/api/lexmorph/type/pos.ecore" '
+              'xmlns:tcas="http:///uima/tcas.ecore" xmi:version="2.0">\n'
+              '<cas:NULL xmi:id="0"/>\n')
+
+# Function to build a German-looking content vocabulary, the same seed always gives the same words
+def build_vocabulary(size=5000, seed=0):
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        kind = rng.random()
+        stem = rng.choice(STEMS)
+        if rng.random() < 0.3:
+            stem += rng.choice(STEMS)    # German compounds
+        if kind < 0.6:
+            word = (rng.choice(PREFIXES) + stem + rng.choice(NOUN_SUFFIXES)).capitalize()
+        elif kind < 0.8:
+            word = rng.choice(PREFIXES) + stem + rng.choice(ADJECTIVE_SUFFIXES)
+        else:
+            word = rng.choice(PREFIXES) + stem + rng.choice(VERB_SUFFIXES)
+        words.add(word)
+    return sorted(words)
+
+# Function to generate the running text of one document with Zipf-like word frequencies
+def generate_text(rng, vocabulary, num_tokens, topic_words):
+    weights = [1.0 / rank for rank in range(1, len(vocabulary) + 1)]
+    content_words = rng.choices(vocabulary, weights=weights, k=num_tokens)
+    sentences = []
+    sentence = [rng.choice(BOILERPLATE)]
+    for position in range(num_tokens):
+        roll = rng.random()
+        if roll < FUNCTION_WORD_SHARE:
+            sentence.append(rng.choice(FUNCTION_WORDS))
+        elif roll < FUNCTION_WORD_SHARE + 0.15:
+            sentence.append(rng.choice(topic_words))    # Words of the document's own topic
+        else:
+            sentence.append(content_words[position])
+        if len(sentence) >= rng.randint(8, 25):
+            sentences.append(' '.join(sentence) + rng.choice(('.', '.', '.', '?', '!', ':')))
+            sentence = [rng.choice(BOILERPLATE)]
+    sentences.append(' '.join(sentence) + '.')
+    return ' '.join(sentences)
+
+# Function to write one UIMA XMI document with the text as cas:Sofa and per-token annotations after it
+def write_xmi(path, text, annotation_factor=1.0, rng=None):
+    rng = rng or random.Random(0)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(XMI_HEADER)
+        f.write(f'<cas:Sofa xmi:id="1" sofaNum="1" sofaID="_InitialView" mimeType="text" sofaString={quoteattr(text)}/>\n')
+
+        # DKPro-style token, POS and lemma annotations, the bulk of a real GerParCor file
+        annotation_id = 2
+        offset = 0
+        for token in text.split(' '):
+            if rng.random() > annotation_factor:
+                offset += len(token) + 1
+                continue
+            begin, end = offset, offset + len(token)
+            f.write(f'<type4:Token xmi:id="{annotation_id}" sofa="1" begin="{begin}" end="{end}" '
+                    f'pos="{annotation_id + 1}" lemma="{annotation_id + 2}" order="0"/>\n')
+            f.write(f'<pos:POS xmi:id="{annotation_id + 1}" sofa="1" begin="{begin}" end="{end}" '
+                    f'PosValue="NN" coarseValue="NOUN"/>\n')
+            f.write(f'<type4:Lemma xmi:id="{annotation_id + 2}" sofa="1" begin="{begin}" end="{end}" '
+                    f'value={quoteattr(token.lower())}/>\n')
+            annotation_id += 3
+            offset = end + 1
+        f.write(f'<cas:View sofa="1" members="{" ".join(str(i) for i in range(2, annotation_id))}"/>\n')
+        f.write('</xmi:XMI>\n')
+
+# Function to generate a folder of synthetic GerParCor-like .xmi files
+def generate_corpus(output_dir, num_docs=100, tokens_per_doc=2000, vocabulary_size=5000, num_topics=10,
+                    annotation_factor=1.0, seed=0):
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    vocabulary = build_vocabulary(vocabulary_size, seed)
+    topics = [rng.sample(vocabulary, 30) for _ in range(num_topics)]
+
+    file_paths = []
+    for doc_id in range(num_docs):
+        # Document lengths vary around the requested size like real protocols do
+        num_tokens = max(10, int(rng.gauss(tokens_per_doc, tokens_per_doc / 4)))
+        text = generate_text(rng, vocabulary, num_tokens, rng.choice(topics))
+        path = os.path.join(output_dir, f"synthetic_{doc_id:05d}.xmi")
+        write_xmi(path, text, annotation_factor, rng)
+        file_paths.append(path)
+    return file_paths
+
+# Command line entry point, e.g. python synthetic_xmi.py bench_data/1981-1985 --num-docs 500 --tokens-per-doc 4000
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic GerParCor-like UIMA XMI files.",
+        epilog="The text has German-looking compound vocabulary with Zipf-like frequencies, function words, agenda "
+               "boilerplate and per-document topic words. DKPro-style token, POS and lemma annotations follow it.")
+    parser.add_argument('output_dir')
+    parser.add_argument('--num-docs', type=int, default=100)
+    parser.add_argument('--tokens-per-doc', type=int, default=2000)
+    parser.add_argument('--vocabulary-size', type=int, default=5000)
+    parser.add_argument('--annotation-factor', type=float, default=1.0,
+                        help="Share of tokens that get token/POS/lemma annotations (0 for text only)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    paths = generate_corpus(args.output_dir, args.num_docs, args.tokens_per_doc, args.vocabulary_size,
+                            annotation_factor=args.annotation_factor, seed=args.seed)
+    print(f"Wrote {len(paths)} files to {args.output_dir}")
+    return 0
+
+## Main execution point
+if __name__ == '__main__':
+    sys.exit(main())
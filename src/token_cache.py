@@ -0,0 +1,143 @@
+import os
+import hashlib
+import json
+import pickle
+from array import array
+from preprocessing import resolve_config, preprocess_files
+
+# Bump when the preprocessing code changes in a way the configuration does not capture
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = '.token_cache'
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Function to get the installed NLTK version without importing NLTK itself
+def nltk_version():
+    from importlib.metadata import version
+    return version('nltk')
+
+# Function to compute the content hash of a file
+def file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Function to fingerprint a preprocessing configuration
+def config_fingerprint(**config):
+    fingerprint_data = {
+        'config': resolve_config(**config),
+        'cache_version': CACHE_VERSION,
+        'nltk_version': nltk_version()
+    }
+    encoded = json.dumps(fingerprint_data, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+# Function to derive the shard name for a folder of .xmi files
+def shard_name(folder_path):
+    absolute_path = os.path.abspath(folder_path)
+    path_hash = hashlib.sha1(absolute_path.encode('utf-8')).hexdigest()[:8]
+    return f"{os.path.basename(absolute_path.rstrip(os.sep))}-{path_hash}"
+
+# Persistent cache of preprocessed token lists, keyed by file content hash and pipeline configuration
+class TokenCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, **config):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.config = config
+        self.fingerprint = config_fingerprint(**config)
+        self.hits = 0
+        self.misses = 0
+
+    # Path of the shard file for one folder under the current configuration
+    def shard_path(self, name):
+        return os.path.join(self.cache_dir, self.fingerprint, name + '.pkl')
+
+    # Function to load a shard as a dict of file hash -> token list
+    def load_shard(self, name):
+        path = self.shard_path(name)
+        # A missing shard may also have just been evicted by another process sharing the cache directory
+        try:
+            with open(path, 'rb') as f:
+                shard = pickle.load(f)
+                os.utime(f.fileno())    # Mark the shard as recently used for eviction
+        except FileNotFoundError:
+            return {}
+
+        vocabulary = shard['vocabulary']
+        docs_by_hash = {}
+        for hash_value, encoded in shard['entries'].items():
+            token_ids = array('I')
+            token_ids.frombytes(encoded)
+            docs_by_hash[hash_value] = [vocabulary[token_id] for token_id in token_ids]
+        return docs_by_hash
+
+    # Function to write a shard with integer-encoded tokens and its own vocabulary
+    def save_shard(self, name, docs_by_hash):
+        vocabulary = []
+        token_to_id = {}
+        entries = {}
+        for hash_value, tokens in docs_by_hash.items():
+            token_ids = array('I')
+            for token in tokens:
+                token_id = token_to_id.get(token)
+                if token_id is None:
+                    token_id = token_to_id[token] = len(vocabulary)
+                    vocabulary.append(token)
+                token_ids.append(token_id)
+            entries[hash_value] = token_ids.tobytes()
+
+        # Write to a temporary file first so an interrupted run never leaves a broken shard
+        path = self.shard_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'vocabulary': vocabulary, 'entries': entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        self.evict(keep=path)
+
+    # Function to delete the least recently used shards until the cache fits into max_bytes
+    def evict(self, keep=None):
+        shard_files = []
+        for root, dirs, files in os.walk(self.cache_dir):
+            for file in files:
+                if file.endswith('.pkl'):
+                    path = os.path.join(root, file)
+                    # Other processes share the cache directory and may evict a shard while it is scanned
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    shard_files.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in shard_files)
+        for _, size, path in sorted(shard_files):
+            if total_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass    # Already removed by another process, its space is freed all the same
+            total_bytes -= size
+
+    # Function to preprocess the .xmi files of a folder, only running the pipeline for uncached files
+    def preprocess_files(self, file_paths, name, workers=1, batch_size=64):
+        cached_docs = self.load_shard(name)
+        hashes = [file_hash(path) for path in file_paths]
+
+        missing_paths = [path for path, hash_value in zip(file_paths, hashes) if hash_value not in cached_docs]
+        self.hits += len(file_paths) - len(missing_paths)
+        self.misses += len(missing_paths)
+
+        if missing_paths:
+            missing_docs = preprocess_files(missing_paths, workers=workers, batch_size=batch_size, **self.config)
+            missing_hashes = [hash_value for hash_value in hashes if hash_value not in cached_docs]
+            cached_docs.update(zip(missing_hashes, missing_docs))
+
+            # Only keep entries of files that are still part of the folder
+            current_hashes = set(hashes)
+            self.save_shard(name, {h: docs for h, docs in cached_docs.items() if h in current_hashes})
+
+        return [cached_docs[hash_value] for hash_value in hashes]
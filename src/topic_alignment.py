@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import numpy as np
+from results_store import MODEL_FILE, load_results
+from comparison_index import period_label, period_years
+from metrics import find_results_files
+
+ALIGNMENT_METRICS = ('hellinger', 'jensen_shannon')
+
+# Rows of the first period compared at once, bounds the size of the topics x topics x vocabulary block
+JS_CHUNK_ROWS = 4
+
+# Function to order results files chronologically by the years in their labels
+def order_periods(results_files):
+    def sort_key(results_path):
+        start_year, end_year = period_years(period_label(results_path))
+        return (start_year is None, start_year or 0, end_year or 0, period_label(results_path))
+    return sorted(results_files, key=sort_key)
+
+# Function to fingerprint the saved model of a results file, a changed fingerprint invalidates its cached pairs
+def model_fingerprint(results_path):
+    model_path = os.path.join(results_path, MODEL_FILE) if os.path.isdir(results_path) else results_path
+    stat = os.stat(model_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+# Function to load the topic-word distributions of a period as a dense topics x vocabulary matrix with its vocabulary
+def load_topic_words(results_path):
+    lda_model = load_results(results_path)['lda_model']
+    topics = np.asarray(lda_model.get_topics(), dtype=np.float64)
+    vocabulary = [lda_model.id2word[token_id] for token_id in range(lda_model.num_terms)]
+    return topics, vocabulary
+
+# Function to place the topic-word matrices of several periods on one shared vocabulary
+def shared_topic_matrices(periods):
+    shared_vocabulary = sorted(set().union(*(vocabulary for topics, vocabulary in periods)))
+    token_index = {token: column for column, token in enumerate(shared_vocabulary)}
+    matrices = []
+    for topics, vocabulary in periods:
+        matrix = np.zeros((topics.shape[0], len(shared_vocabulary)), dtype=np.float64)
+        matrix[:, [token_index[token] for token in vocabulary]] = topics
+        matrices.append(matrix)
+    return matrices, shared_vocabulary
+
+# Function to compute the similarity (1 - Hellinger distance) of every topic pair with one matrix product
+def hellinger_similarity(topics_a, topics_b):
+    bhattacharyya = np.sqrt(topics_a) @ np.sqrt(topics_b).T
+    return 1.0 - np.sqrt(np.clip(1.0 - bhattacharyya, 0.0, None))
+
+# Function to compute the similarity (1 - Jensen-Shannon distance, base 2) of every topic pair in broadcast blocks
+def jensen_shannon_similarity(topics_a, topics_b):
+    def entropy_terms(p):
+        return np.where(p > 0, p * np.log2(np.where(p > 0, p, 1.0)), 0.0)
+
+    # Only columns used by either period contribute to the divergence
+    columns = (topics_a.sum(axis=0) > 0) | (topics_b.sum(axis=0) > 0)
+    topics_a, topics_b = topics_a[:, columns], topics_b[:, columns]
+    neg_entropy_a = entropy_terms(topics_a).sum(axis=1)
+    neg_entropy_b = entropy_terms(topics_b).sum(axis=1)
+
+    divergence = np.empty((topics_a.shape[0], topics_b.shape[0]))
+    for start in range(0, topics_a.shape[0], JS_CHUNK_ROWS):
+        block = topics_a[start:start + JS_CHUNK_ROWS, np.newaxis, :]
+        mixture = 0.5 * (block + topics_b[np.newaxis, :, :])
+        # JS(p, q) = H(m) - (H(p) + H(q)) / 2, written with negative entropies
+        divergence[start:start + JS_CHUNK_ROWS] = (0.5 * (neg_entropy_a[start:start + JS_CHUNK_ROWS, np.newaxis]
+                                                         + neg_entropy_b[np.newaxis, :])
+                                                   - entropy_terms(mixture).sum(axis=2))
+    return 1.0 - np.sqrt(np.clip(divergence, 0.0, 1.0))
+
+SIMILARITY_FUNCTIONS = {'hellinger': hellinger_similarity, 'jensen_shannon': jensen_shannon_similarity}
+
+# Function to get the cache file of a period pair, named after the fingerprints of both models
+def pair_cache_path(cache_dir, label_a, label_b, fingerprint_a, fingerprint_b, metric):
+    key = hashlib.sha256(f"{fingerprint_a}|{fingerprint_b}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{label_a}__{label_b}__{metric}__{key}.npy")
+
+# Function to compute or load the topic similarity matrices of the given period pairs
+def pair_similarities(results_files, pairs, cache_dir, metric='hellinger'):
+    if metric not in ALIGNMENT_METRICS:
+        raise ValueError(f"Unknown alignment metric '{metric}', expected one of {ALIGNMENT_METRICS}")
+    os.makedirs(cache_dir, exist_ok=True)
+    labels = [period_label(path) for path in results_files]
+    fingerprints = [model_fingerprint(path) for path in results_files]
+
+    similarities = {}
+    missing = []
+    for a, b in pairs:
+        cache_path = pair_cache_path(cache_dir, labels[a], labels[b], fingerprints[a], fingerprints[b], metric)
+        if os.path.exists(cache_path):
+            similarities[(a, b)] = np.load(cache_path)
+        else:
+            missing.append((a, b, cache_path))
+    print(f"Topic alignment: {len(pairs) - len(missing)} cached and {len(missing)} new period pairs")
+    if not missing:
+        return similarities
+
+    # Only the periods of uncached pairs are loaded, on the vocabulary they share
+    needed = sorted({a for a, b, cache_path in missing} | {b for a, b, cache_path in missing})
+    matrices, shared_vocabulary = shared_topic_matrices([load_topic_words(results_files[i]) for i in needed])
+    matrix_of = dict(zip(needed, matrices))
+
+    similarity_function = SIMILARITY_FUNCTIONS[metric]
+    for a, b, cache_path in missing:
+        similarity = similarity_function(matrix_of[a], matrix_of[b])
+        # Drop stale matrices of the same pair before writing the current one
+        prefix = f"{labels[a]}__{labels[b]}__{metric}__"
+        for filename in os.listdir(cache_dir):
+            if filename.startswith(prefix):
+                os.remove(os.path.join(cache_dir, filename))
+        temp_path = cache_path + '.tmp.npy'
+        np.save(temp_path, similarity)
+        os.replace(temp_path, cache_path)
+        similarities[(a, b)] = similarity
+    return similarities
+
+# Function to link topics of consecutive periods into lineage chains
+# A topic continues a chain when it and the chain's last topic are each other's best match above the threshold
+def lineage_chains(num_topics_per_period, similarities, threshold=0.5):
+    chains = []
+    open_chains = {}    # topic id of the previous period -> chain it ends
+    for period, num_topics in enumerate(num_topics_per_period):
+        next_open = {}
+        similarity = similarities.get((period - 1, period))
+        for topic_id in range(num_topics):
+            chain = None
+            if similarity is not None:
+                predecessor = int(np.argmax(similarity[:, topic_id]))
+                is_mutual = int(np.argmax(similarity[predecessor])) == topic_id
+                if is_mutual and similarity[predecessor, topic_id] >= threshold and predecessor in open_chains:
+                    chain = open_chains[predecessor]
+                    chain['similarities'].append(float(similarity[predecessor, topic_id]))
+            if chain is None:
+                chain = {'start_period': period, 'topics': [], 'similarities': []}
+                chains.append(chain)
+            chain['topics'].append(topic_id)
+            next_open[topic_id] = chain
+        open_chains = next_open
+    return chains
+
+# Function to align the topics of all periods of a results folder and build their lineage chains
+def align_periods(results_folder='Results', cache_dir='Alignment Cache', metric='hellinger', threshold=0.5,
+                  all_pairs=False):
+    results_files = order_periods(find_results_files(results_folder))
+    labels = [period_label(path) for path in results_files]
+    num_periods = len(results_files)
+
+    # Consecutive pairs are enough for lineage chains, all pairs also allow comparing distant periods
+    if all_pairs:
+        pairs = [(a, b) for a in range(num_periods) for b in range(a + 1, num_periods)]
+    else:
+        pairs = [(a, a + 1) for a in range(num_periods - 1)]
+    similarities = pair_similarities(results_files, pairs, cache_dir, metric)
+
+    # Topic counts come from the shapes of the similarity matrices (topics of a x topics of b), results are
+    # only loaded for a period no pair covers
+    num_topics_per_period = [None] * num_periods
+    for (a, b), similarity in similarities.items():
+        num_topics_per_period[a], num_topics_per_period[b] = similarity.shape
+    for period, num_topics in enumerate(num_topics_per_period):
+        if num_topics is None:
+            num_topics_per_period[period] = len(load_results(results_files[period])['top_words_per_topic'])
+    chains = lineage_chains(num_topics_per_period, similarities, threshold)
+    for chain in chains:
+        chain['periods'] = labels[chain['start_period']:chain['start_period'] + len(chain['topics'])]
+
+    return {
+        'labels': labels,
+        'metric': metric,
+        'similarities': {(labels[a], labels[b]): similarity for (a, b), similarity in similarities.items()},
+        'chains': chains
+    }
+
+# Function to print the lineage chains that span more than one period, with the top words of their first topic
+def print_chains(alignment, results_folder='Results', num_words=5):
+    results_files = {period_label(path): path for path in find_results_files(results_folder)}
+    top_words = {}    # label -> top words per topic, loaded once for the periods printed chains start in
+    for chain in sorted(alignment['chains'], key=lambda chain: -len(chain['topics'])):
+        if len(chain['topics']) < 2:
+            continue
+        first_label = chain['periods'][0]
+        if first_label not in top_words:
+            top_words[first_label] = load_results(results_files[first_label])['top_words_per_topic']
+        words = top_words[first_label][chain['topics'][0]][:num_words]
+        steps = ' -> '.join(f"{label}:{topic_id}" for label, topic_id in zip(chain['periods'], chain['topics']))
+        print(f"{steps} (min similarity {min(chain['similarities']):.2f}) {', '.join(words)}")
+
+# Command line entry point, e.g. python topic_alignment.py --metric jensen_shannon --output alignment.json
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Align LDA topics across time spans and build topic lineages.",
+        epilog="Topics are compared on a shared vocabulary with 1 - Hellinger or 1 - Jensen-Shannon distance. Topics "
+               "of consecutive periods that are each other's best match above --threshold form lineage chains. "
+               "Similarity matrices are cached per period pair and keyed on both saved models, so a new period "
+               "only computes its new pairs.")
+    parser.add_argument('--results-folder', default='Results')
+    parser.add_argument('--cache-dir', default='Alignment Cache', help="Per period pair cache of similarity matrices")
+    parser.add_argument('--metric', choices=ALIGNMENT_METRICS, default='hellinger')
+    parser.add_argument('--threshold', type=float, default=0.5, help="Minimum similarity to continue a lineage")
+    parser.add_argument('--all-pairs', action='store_true', help="Compare every pair of periods, not only consecutive ones")
+    parser.add_argument('--output', default=None, help="JSON file for the chains and similarity matrices")
+    args = parser.parse_args(argv)
+    alignment = align_periods(args.results_folder, args.cache_dir, args.metric, args.threshold, args.all_pairs)
+    print_chains(alignment, args.results_folder)
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'labels': alignment['labels'], 'metric': alignment['metric'], 'chains': alignment['chains'],
+                       'similarities': [{'periods': list(pair), 'matrix': similarity.tolist()}
+                                        for pair, similarity in alignment['similarities'].items()]}, f, indent=2)
+    return 0
+
+## Main execution point
+if __name__ == '__main__':
+    sys.exit(main())
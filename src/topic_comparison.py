@@ -0,0 +1,120 @@
+import numpy as np
+from collections import Counter
+from itertools import chain
+
+# Function to infer the full document x topic matrix in chunks instead of one document at a time
+def document_topic_matrix(lda_model, corpus, chunksize=2000):
+    from gensim import utils
+    rows = []
+    for chunk in utils.grouper(corpus, chunksize):
+        gamma, _ = lda_model.inference(chunk)
+
+        # Normalize topic by topic, the same summation order lda_model[doc] uses for a single document
+        totals = gamma[:, 0].copy()
+        for topic_id in range(1, gamma.shape[1]):
+            totals += gamma[:, topic_id]
+        rows.append(gamma / totals[:, np.newaxis])
+
+    if not rows:
+        return np.zeros((0, lda_model.num_topics), dtype=lda_model.dtype)
+    return np.vstack(rows)
+
+# Function to derive the dominant topics of every document from the document x topic matrix
+def dominant_topics_from_matrix(doc_topics, dominance_threshold=0.2):
+    # Topics ordered by contribution, ties keep the lower topic id first like the stable sort they replace
+    order = np.argsort(-doc_topics, axis=1, kind='stable')
+    sorted_weights = np.take_along_axis(doc_topics, order, axis=1)
+    is_dominant = sorted_weights >= dominance_threshold
+
+    dominant_topics_per_doc = []
+    for doc_order, doc_dominant in zip(order, is_dominant):
+        dominant_topics = doc_order[doc_dominant].tolist()
+        if not dominant_topics:
+            dominant_topics = [int(doc_order[0])]    # Use top topic if none meet the threshold
+        dominant_topics_per_doc.append(dominant_topics)
+    return dominant_topics_per_doc
+
+# Integer encoding of every lemma in the corpus, ids are assigned in order of first occurrence
+class LemmaVocabulary:
+    def __init__(self):
+        self.token2id = {}
+        self.id2token = []
+
+    # Function to encode a document, adding unseen lemmas to the vocabulary
+    def encode(self, doc):
+        token2id = self.token2id
+        token_ids = np.empty(len(doc), dtype=np.int64)
+        for position, token in enumerate(doc):
+            token_id = token2id.get(token)
+            if token_id is None:
+                token_id = token2id[token] = len(self.id2token)
+                self.id2token.append(token)
+            token_ids[position] = token_id
+        return token_ids
+
+    def __len__(self):
+        return len(self.id2token)
+
+# Function to compute the most frequent lemmas (count desc, first occurrence first) of an encoded document
+def most_common_ids(token_ids, n=10):
+    if len(token_ids) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    unique_ids, first_positions, counts = np.unique(token_ids, return_index=True, return_counts=True)
+    order = np.lexsort((first_positions, -counts))[:n]
+    return unique_ids[order], counts[order]
+
+# Function to count every lemma over the whole corpus
+def count_lemmas(prep_docs):
+    return Counter(chain.from_iterable(prep_docs))
+
+# Function to find the lemmas that are too common to be compared (more frequent than half the number of documents)
+def find_common_lemmas(lemma_counts, num_docs):
+    frequency_threshold = 0.5 * num_docs
+    return {lemma for lemma, count in lemma_counts.items() if count > frequency_threshold}
+
+# Function to compare the most frequent lemmas of each document with the words of its dominant topics
+def compare_lemmas_with_topics(prep_docs, top_words_per_topic, dominant_topics_per_doc, top_n=10,
+                               common_lemmas=None, doc_ids=None):
+    # Define frequency threshold to exclude overly common lemmas, unless the caller already knows them
+    if common_lemmas is None:
+        common_lemmas = find_common_lemmas(count_lemmas(prep_docs), len(prep_docs))
+
+    # Common lemmas get the lowest ids and topic words the ones after them, so both can be looked up by id range
+    vocabulary = LemmaVocabulary()
+    vocabulary.encode(sorted(common_lemmas))
+    num_common = len(vocabulary)
+    vocabulary.encode(sorted(set(chain.from_iterable(top_words_per_topic.values())) - common_lemmas))
+    num_known = len(vocabulary)
+
+    # Topic x lemma membership matrix over the common lemmas and topic words
+    topic_ids = sorted(top_words_per_topic)
+    topic_index = {topic_id: row for row, topic_id in enumerate(topic_ids)}
+    topic_membership = np.zeros((len(topic_ids), num_known), dtype=bool)
+    for topic_id, words in top_words_per_topic.items():
+        topic_membership[topic_index[topic_id], [vocabulary.token2id[word] for word in words]] = True
+
+    # Compare every (selected) document with its dominant topics on the integer representation
+    selected = None if doc_ids is None else set(doc_ids)
+    comparison_results = []
+    for doc_id, doc in enumerate(prep_docs):
+        if selected is not None and doc_id not in selected:
+            continue
+        token_ids = vocabulary.encode(doc)
+        token_ids = token_ids[token_ids >= num_common]    # Filter common lemmas out of the document
+        dominant_topics = dominant_topics_per_doc[doc_id]
+
+        top_ids, top_counts = most_common_ids(token_ids, top_n)
+        doc_lemma_ids = np.unique(token_ids)
+        doc_lemma_ids = doc_lemma_ids[doc_lemma_ids < num_known]    # Only these can be topic words
+        dominant_rows = [topic_index[topic_id] for topic_id in dominant_topics]
+        common_ids = doc_lemma_ids[topic_membership[dominant_rows].any(axis=0)[doc_lemma_ids]]
+
+        comparison_results.append({
+            'document': doc_id,
+            'dominant_topics': dominant_topics,
+            'most_frequent_lemmas': [(vocabulary.id2token[token_id], int(count))
+                                     for token_id, count in zip(top_ids, top_counts)],    # Top 10 most frequent lemmas
+            # Words common between topics and lemmas, sorted so the order does not depend on string hashing
+            'common_words': sorted(vocabulary.id2token[token_id] for token_id in common_ids)
+        })
+    return comparison_results
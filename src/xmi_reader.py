@@ -0,0 +1,103 @@
+import os
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from xml.parsers import expat
+
+# UIMA namespace and the name expat reports for the element holding the raw text
+CAS_NAMESPACE = 'http:///uima/cas.ecore'
+SOFA_TAG = CAS_NAMESPACE + '}Sofa'
+CHUNK_SIZE = 1 << 16    # Bytes fed to the parser at a time
+
+# Raised from the parser callback to stop reading once the cas:Sofa element was seen
+class _SofaFound(Exception):
+    pass
+
+# Function to read the raw text of an .xmi file by building the whole CAS tree (original approach)
+def read_sofa_text_tree(file_path):
+    tree = ET.parse(file_path)
+    root = tree.getroot()
+    return root.find('.//cas:Sofa', namespaces={'cas': CAS_NAMESPACE}).get('sofaString')
+
+# Function to stream through an .xmi file and return the raw text of the first cas:Sofa element
+def read_sofa_text(file_path):
+    sofa_strings = []
+
+    # Only look at start tags, no elements are ever built for the annotations
+    def start_element(name, attrs):
+        if name == SOFA_TAG:
+            sofa_strings.append(attrs.get('sofaString'))
+            raise _SofaFound()
+
+    parser = expat.ParserCreate(namespace_separator='}')
+    parser.StartElementHandler = start_element
+
+    # Feed the file in chunks so the rest of the file is never read once the text was found
+    with open(file_path, 'rb') as f:
+        try:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                parser.Parse(chunk, len(chunk) == 0)
+                if len(chunk) == 0:
+                    break
+        except _SofaFound:
+            pass
+
+    return sofa_strings[0] if sofa_strings else None
+
+# Function to collect all .xmi files below a folder
+def find_xmi_files(folder_path):
+    xmi_files = []
+    for root, dirs, files in os.walk(folder_path):
+        for file in files:
+            if file.endswith('.xmi'):
+                xmi_files.append(os.path.join(root, file))
+    return xmi_files
+
+# Function to measure throughput and peak memory of one reader over a list of files
+def measure_reader(reader, file_paths):
+    total_bytes = sum(os.path.getsize(path) for path in file_paths)
+    start = time.perf_counter()
+    for path in file_paths:
+        reader(path)
+    elapsed = time.perf_counter() - start
+
+    # Measure memory in a second pass, tracemalloc slows down the parsers considerably
+    tracemalloc.start()
+    for path in file_paths:
+        reader(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'files': len(file_paths),
+        'seconds': elapsed,
+        'docs_per_second': len(file_paths) / elapsed if elapsed > 0 else 0,
+        'mb_per_second': total_bytes / 1e6 / elapsed if elapsed > 0 else 0,
+        'peak_memory_mb': peak / 1e6
+    }
+
+# Function to compare the tree-based reader with the streaming reader on a folder of .xmi files
+def compare_readers(folder_path):
+    file_paths = find_xmi_files(folder_path)
+    if len(file_paths) == 0:
+        print("No .xmi files found.")
+        return {}
+
+    # Make sure all readers agree before timing them
+    for path in file_paths:
+        if read_sofa_text(path) != read_sofa_text_tree(path):
+            raise ValueError(f"Streaming reader returned different text for {path}")
+
+    readers = {
+        'ElementTree.parse': read_sofa_text_tree,
+        'streaming': read_sofa_text
+    }
+
+    comparison = {}
+    for name, reader in readers.items():
+        stats = measure_reader(reader, file_paths)
+        comparison[name] = stats
+        print(f"{name}: {stats['docs_per_second']:.1f} docs/s, {stats['mb_per_second']:.1f} MB/s, "
+              f"peak memory {stats['peak_memory_mb']:.1f} MB")
+    return comparison
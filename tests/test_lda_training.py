@@ -0,0 +1,31 @@
+import random
+from gensim import corpora
+from lda_training import train_lda_model
+
+# Function to build a small bag-of-words corpus with a few planted topics
+def planted_corpus(num_docs=120, num_topics=5, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(300)]
+    topics = [rng.sample(vocabulary, 20) for _ in range(num_topics)]
+    docs = [[rng.choice(topics[doc_id % num_topics]) if rng.random() < 0.6 else rng.choice(vocabulary)
+             for _ in range(150)] for doc_id in range(num_docs)]
+    dictionary = corpora.Dictionary(docs)
+    return [dictionary.doc2bow(doc) for doc in docs], dictionary
+
+# Online training stops early, at convergence its perplexity has to be close to a full single-engine run
+def test_online_converges_to_single_perplexity():
+    corpus, dictionary = planted_corpus()
+    single_model, single_stats = train_lda_model(corpus, dictionary, engine='single', num_topics=5, passes=20,
+                                                 random_state=1)
+    online_model, online_stats = train_lda_model(corpus, dictionary, engine='online', num_topics=5, passes=20,
+                                                 random_state=1)
+    assert online_stats['passes'] < 20
+    assert abs(online_stats['perplexity'] - single_stats['perplexity']) / single_stats['perplexity'] < 0.05
+
+# Every extra online pass goes over the same documents, they must not be counted again
+def test_online_passes_do_not_recount_documents():
+    corpus, dictionary = planted_corpus()
+    lda_model, training_stats = train_lda_model(corpus, dictionary, engine='online', num_topics=5, passes=5,
+                                                convergence_tol=0, random_state=1)
+    assert training_stats['passes'] == 5
+    assert lda_model.state.numdocs == len(corpus)
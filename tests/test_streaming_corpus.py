@@ -0,0 +1,69 @@
+import os
+import pickle
+import tracemalloc
+import pytest
+import benchmark
+import preprocessing
+import synthetic_xmi
+from lda_topic_modelling import process_documents
+from streaming_corpus import write_token_file
+
+# Small batches and LDA chunks, so the documents held at once stay far below the corpus sizes used here
+BATCH_SIZE = 8
+LDA_OPTIONS = {'num_topics': 5, 'passes': 1, 'chunksize': 16, 'random_state': 0}
+
+# Function to run process_documents under tracemalloc and return the results with the peak traced memory in MB
+def traced_run(folder_path, stream_dir=None):
+    tracemalloc.start()
+    try:
+        results = process_documents(folder_path, batch_size=BATCH_SIZE, stream_dir=stream_dir, lda_options=LDA_OPTIONS)
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return results, peak_bytes / 2 ** 20
+
+# Offline NLTK stand-ins for the preprocessing module while the tests of this module run, undone afterwards
+@pytest.fixture(scope='module')
+def offline_nltk():
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        if not benchmark.nltk_data_available():
+            for name, value in benchmark.offline_nltk_patches().items():
+                monkeypatch.setattr(preprocessing, name, value)
+        yield
+
+# Streaming and in-memory runs on a small and a six times larger synthetic corpus, shared by the tests below
+@pytest.fixture(scope='module')
+def runs(tmp_path_factory, offline_nltk):
+    data_dir = tmp_path_factory.mktemp('streaming')
+    for name, num_docs in (('small', 16), ('large', 96)):
+        synthetic_xmi.generate_corpus(str(data_dir / name), num_docs=num_docs, tokens_per_doc=1500,
+                                      vocabulary_size=1000, seed=1)
+    return {
+        'small_streaming': traced_run(str(data_dir / 'small'), stream_dir=str(data_dir / 'small_stream')),
+        'large_streaming': traced_run(str(data_dir / 'large'), stream_dir=str(data_dir / 'large_stream')),
+        'large_in_memory': traced_run(str(data_dir / 'large'))
+    }
+
+# Streaming only changes where the documents are kept, not the results
+def test_streaming_matches_in_memory(runs):
+    streaming, in_memory = runs['large_streaming'][0], runs['large_in_memory'][0]
+    assert streaming['comparison_results'] == in_memory['comparison_results']
+    assert streaming['top_words_per_topic'] == in_memory['top_words_per_topic']
+    assert streaming['dominant_topics_per_doc'] == in_memory['dominant_topics_per_doc']
+
+# The streaming peak is set by the batch and chunk sizes, six times more documents may only add their small results
+def test_streaming_peak_memory_is_bounded(runs):
+    small_peak, large_peak = runs['small_streaming'][1], runs['large_streaming'][1]
+    assert large_peak < 1.25 * small_peak
+    assert large_peak < runs['large_in_memory'][1]
+
+# Pickled streaming results keep working from another working directory
+def test_token_file_corpus_survives_change_of_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('stream')
+    token_corpus, dictionary = write_token_file([['haus', 'recht'], ['land']], os.path.join('stream', 'tokens.txt'))
+    pickled = pickle.dumps(token_corpus)
+
+    os.makedirs('elsewhere')
+    monkeypatch.chdir('elsewhere')
+    assert list(pickle.loads(pickled)) == [['haus', 'recht'], ['land']]
@@ -0,0 +1,66 @@
+import random
+from collections import Counter
+from gensim import corpora, models
+from topic_comparison import (document_topic_matrix, dominant_topics_from_matrix, compare_lemmas_with_topics,
+                              find_common_lemmas, count_lemmas)
+
+# Function to build seeded documents, an LDA model trained on them and its top words per topic
+def seeded_model(num_docs=120, num_topics=6, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [f"lemma{i}" for i in range(400)]
+    topics = [rng.sample(vocabulary, 25) for _ in range(num_topics)]
+    frequent = vocabulary[:3]    # Lemmas in nearly every document, they end up as common lemmas
+    docs = [[rng.choice(topics[doc_id % num_topics]) if rng.random() < 0.5 else rng.choice(vocabulary)
+             for _ in range(rng.randint(20, 200))] + frequent for doc_id in range(num_docs)]
+    dictionary = corpora.Dictionary(docs)
+    corpus = [dictionary.doc2bow(doc) for doc in docs]
+    lda_model = models.LdaModel(corpus, num_topics=num_topics, id2word=dictionary, passes=5, random_state=1)
+    top_words_per_topic = {topic_id: [word for word, prob in lda_model.show_topic(topic_id, topn=25)]
+                           for topic_id in range(num_topics)}
+    return docs, corpus, lda_model, top_words_per_topic
+
+# The per-document loops of process_documents before the comparison stage was vectorized
+def reference_dominant_topics(lda_model, corpus, dominance_threshold=0.2):
+    dominant_topics_per_doc = []
+    for doc_topics in lda_model[corpus]:
+        sorted_topics = sorted(doc_topics, key=lambda x: x[1], reverse=True)
+        dominant_topics = [topic[0] for topic in sorted_topics if topic[1] >= dominance_threshold]
+        if not dominant_topics:
+            dominant_topics = [sorted_topics[0][0]]
+        dominant_topics_per_doc.append(dominant_topics)
+    return dominant_topics_per_doc
+
+def reference_comparison(prep_docs, top_words_per_topic, dominant_topics_per_doc):
+    lemma_counter = Counter(lemma for doc in prep_docs for lemma in doc)
+    frequency_threshold = 0.5 * len(prep_docs)
+    common_lemmas = {lemma for lemma, count in lemma_counter.items() if count > frequency_threshold}
+    comparison_results = []
+    for doc_id, doc in enumerate(prep_docs):
+        lemmas = [lemma for lemma in doc if lemma not in common_lemmas]
+        common_words = set()
+        for dominant_topic in dominant_topics_per_doc[doc_id]:
+            common_words.update(set(lemmas).intersection(set(top_words_per_topic[dominant_topic])))
+        comparison_results.append({
+            'document': doc_id,
+            'dominant_topics': dominant_topics_per_doc[doc_id],
+            'most_frequent_lemmas': Counter(lemmas).most_common(10),
+            'common_words': list(common_words)
+        })
+    return comparison_results
+
+def test_dominant_topics_match_reference():
+    docs, corpus, lda_model, top_words_per_topic = seeded_model()
+    dominant_topics_per_doc = dominant_topics_from_matrix(document_topic_matrix(lda_model, corpus))
+    assert dominant_topics_per_doc == reference_dominant_topics(lda_model, corpus)
+
+# The reference order of common_words followed string hashing, the vectorized stage returns them sorted
+def test_comparison_matches_reference():
+    docs, corpus, lda_model, top_words_per_topic = seeded_model()
+    dominant_topics_per_doc = reference_dominant_topics(lda_model, corpus)
+    reference = reference_comparison(docs, top_words_per_topic, dominant_topics_per_doc)
+    for result in reference:
+        result['common_words'] = sorted(result['common_words'])
+
+    assert {'lemma0', 'lemma1', 'lemma2'} <= find_common_lemmas(count_lemmas(docs), len(docs))
+    assert compare_lemmas_with_topics(docs, top_words_per_topic, dominant_topics_per_doc) == reference
+    assert any(result['common_words'] for result in reference)